@@ -18,6 +18,7 @@
 
 __author__ = 'Dimitri Desmidt, Emanuele Mazza, Yves Fauser'
 
+import sys
 import argparse
 import ConfigParser
 import json
@@ -25,6 +26,7 @@ from libutils import get_scope
 from libutils import get_logical_switch
 from tabulate import tabulate
 from nsxramlclient.client import NsxClient
+from nsxramlclient.errors import NsxError
 
 
 def logical_switch_create(client_session, transport_zone, logical_switch_name, control_plane_mode=None):
@@ -194,6 +196,8 @@ def main():
     except KeyError:
         print('Unknown command')
         parser.print_help()
+    except NsxError as e:
+        sys.exit(str(e))
 
 
 if __name__ == "__main__":
@@ -1 +1,3 @@
 __author__ = 'yfauser'
+
+__version__ = '1.0.3'
@@ -0,0 +1,141 @@
+# coding=utf-8
+#
+# Copyright © 2015 VMware, Inc. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+# to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+
+
+
+__author__ = 'yfauser'
+
+from concurrent import futures
+
+import client
+
+
+class AsyncNsxClient(object):
+    """
+    A client with the API of NsxClient whose calls return a concurrent.futures.Future instead of blocking. The calls
+    run on a bounded pool of worker threads sharing one HTTP session, so many calls can be in flight while the
+    caller carries on. On python 3 event loops, asyncio.wrap_future turns the returned futures into awaitables
+    """
+    def __init__(self, raml_file, nsxmanager, nsx_username, nsx_password, max_concurrency=None, executor=None,
+                 **client_options):
+        """
+        :param raml_file: The RAML File or binding module, see NsxClient
+        :param nsxmanager: The hostname or IP Address of the NSX Manager
+        :param nsx_username: The Username on NSX Manager used to do API Calls
+        :param nsx_password: The Password of the User used to do API Calls
+        :param max_concurrency: Optional: The number of calls sent to NSX Manager at the same time, further calls
+               wait in a queue. It also sizes the connection pool, so every call reuses an open connection.
+               Default: 32
+        :param executor: Optional: A concurrent.futures.Executor to run the calls on, e.g. to share one bounded
+               pool between the clients of several NSX Managers. Default: a pool of max_concurrency threads owned
+               by this client
+        :param client_options: Optional: Any keyword argument of NsxClient, e.g. auth_token=True
+        :return: Returns an AsyncNsxClient Session Object
+        """
+        max_concurrency = max_concurrency or 32
+        client_options.setdefault('pool_maxsize', max_concurrency)
+        self._client = client.NsxClient(raml_file, nsxmanager, nsx_username, nsx_password, **client_options)
+        if executor:
+            self._executor = executor
+            self._owns_executor = False
+        else:
+            self._executor = futures.ThreadPoolExecutor(max_workers=max_concurrency)
+            self._owns_executor = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+    @property
+    def client(self):
+        """
+        :return: The blocking NsxClient used by this client, e.g. to extract body schemas
+        """
+        return self._client
+
+    def read(self, searched_resource, uri_parameters=None, request_body_dict=None, query_parameters_dict=None,
+             additional_headers=None, timeout=None, deadline=None):
+        """
+        Read a resource using the GET HTTP Method, see NsxClient.read
+        :return: A Future of the dictionary containing the received header and body data
+        """
+        return self._submit(searched_resource, 'get', uri_parameters, request_body_dict, query_parameters_dict,
+                            additional_headers, timeout, deadline)
+
+    def create(self, searched_resource, uri_parameters=None, request_body_dict=None, query_parameters_dict=None,
+               additional_headers=None, timeout=None, deadline=None):
+        """
+        Create a resource using the POST HTTP Method, see NsxClient.create
+        :return: A Future of the dictionary containing the received header and body data
+        """
+        return self._submit(searched_resource, 'post', uri_parameters, request_body_dict, query_parameters_dict,
+                            additional_headers, timeout, deadline)
+
+    def update(self, searched_resource, uri_parameters=None, request_body_dict=None, query_parameters_dict=None,
+               additional_headers=None, timeout=None, deadline=None):
+        """
+        Update a resource using the PUT HTTP Method, see NsxClient.update
+        :return: A Future of the dictionary containing the received header and body data
+        """
+        return self._submit(searched_resource, 'put', uri_parameters, request_body_dict, query_parameters_dict,
+                            additional_headers, timeout, deadline)
+
+    def delete(self, searched_resource, uri_parameters=None, request_body_dict=None, query_parameters_dict=None,
+               additional_headers=None, timeout=None, deadline=None):
+        """
+        Delete a resource using the DELETE HTTP Method, see NsxClient.delete
+        :return: A Future of the dictionary containing the received header and body data
+        """
+        return self._submit(searched_resource, 'delete', uri_parameters, request_body_dict, query_parameters_dict,
+                            additional_headers, timeout, deadline)
+
+    def read_all_pages(self, searched_resource, uri_parameters=None, request_body_dict=None,
+                       query_parameters_dict=None, additional_headers=None, timeout=None, deadline=None):
+        """
+        Read all pages of a paged resource, see NsxClient.read_all_pages
+        :return: A Future of the list of all objects
+        """
+        return self._executor.submit(self._client.read_all_pages, searched_resource, uri_parameters,
+                                     request_body_dict, query_parameters_dict, additional_headers, timeout, deadline)
+
+    def download(self, searched_resource, sink, uri_parameters=None, query_parameters_dict=None,
+                 additional_headers=None, progress_callback=None, resume=None, timeout=None, deadline=None):
+        """
+        Download the body of a resource to a file, see NsxClient.download
+        :return: A Future of the number of bytes of the downloaded body
+        """
+        operation = self._client.prepare(searched_resource, 'get')
+        return self._executor.submit(operation.download, sink, uri_parameters, query_parameters_dict,
+                                     additional_headers, progress_callback, resume, timeout, deadline)
+
+    def shutdown(self, wait=True):
+        """
+        Stop the worker threads once the submitted calls are done. An executor passed in is left running
+        :param wait: If set to True, wait until the submitted calls are done
+        """
+        if self._owns_executor:
+            self._executor.shutdown(wait)
+
+    def _submit(self, searched_resource, method, uri_parameters, request_body_dict, query_parameters_dict,
+                additional_headers, timeout, deadline):
+        # the operation is resolved in the calling thread, so an unknown displayName fails the call right away
+        operation = self._client.prepare(searched_resource, method)
+        return self._executor.submit(operation, uri_parameters, request_body_dict, query_parameters_dict,
+                                     additional_headers, timeout, deadline)
@@ -0,0 +1,228 @@
+# coding=utf-8
+#
+# Copyright © 2015 VMware, Inc. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+# to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+
+
+
+__author__ = 'yfauser'
+
+import os
+import json
+import time
+import errno
+import hashlib
+import tempfile
+import threading
+import urlparse
+
+import requests
+from lxml import etree as et
+
+import errors
+
+try:
+    import fcntl
+except ImportError:
+    # no advisory file locks on this platform, concurrent processes may then each fetch a token
+    fcntl = None
+
+DEFAULT_TOKEN_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.nsxramlclient', 'tokens')
+TOKEN_URL_PATH = '/api/2.0/services/auth/token'
+
+
+class TokenAuth(requests.auth.AuthBase):
+    """
+    Authenticates requests with an NSX API auth token instead of HTTP basic credentials. The token is obtained
+    once with the basic credentials and reused until it expires, so NSX Manager does not authenticate against its
+    user store or SSO on every request. Tokens can be shared between processes through a token cache file
+    """
+    def __init__(self, session, username, password, token_lifetime=90, refresh_margin=300, cache_dir=None,
+                 timeout=None):
+        """
+        :param session: The requests Session used to obtain tokens
+        :param username: The Username on NSX Manager the token is obtained for
+        :param password: The Password of the User the token is obtained for
+        :param token_lifetime: The lifetime of a new token in minutes
+        :param refresh_margin: A token is replaced when it expires in less than this number of seconds, so that
+               requests never run into an expired token
+        :param cache_dir: The directory holding the token cache files, defaults to DEFAULT_TOKEN_CACHE_DIR. Set to
+               False to keep tokens in memory only
+        :param timeout: The connect and read timeout of token requests in seconds
+        """
+        self._session = session
+        self._username = username
+        self._password = password
+        self._token_lifetime = token_lifetime
+        self._refresh_margin = refresh_margin
+        self._cache_dir = DEFAULT_TOKEN_CACHE_DIR if cache_dir is None else cache_dir
+        self._timeout = timeout
+        self._tokens = {}
+        self._tokens_lock = threading.Lock()
+
+    def __call__(self, request):
+        nsxmanager_url = self._nsxmanager_url(request.url)
+        request.headers['Authorization'] = 'AUTHTOKEN {}'.format(self.get_token(nsxmanager_url))
+        request.register_hook('response', self._handle_401)
+        return request
+
+    def get_token(self, nsxmanager_url):
+        """
+        :param nsxmanager_url: The scheme and host of the NSX Manager, e.g. https://nsxmanager.example.com
+        :return: A token that is valid for at least refresh_margin seconds. It is taken from memory, from the
+                 token cache file or, when both hold no valid token, newly obtained from NSX Manager
+        """
+        with self._tokens_lock:
+            token = self._tokens.get(nsxmanager_url)
+            if not self._is_valid(token):
+                token = self._get_shared_token(nsxmanager_url)
+                self._tokens[nsxmanager_url] = token
+            return token[0]
+
+    def invalidate_token(self, nsxmanager_url, token_value):
+        """
+        Drop a token that NSX Manager rejected, e.g. after a restart of NSX Manager, from memory and from the token
+        cache file. A token that was already replaced by another thread or process is left alone
+        :param nsxmanager_url: The scheme and host of the NSX Manager
+        :param token_value: The rejected token
+        """
+        with self._tokens_lock:
+            token = self._tokens.get(nsxmanager_url)
+            if token and token[0] == token_value:
+                del self._tokens[nsxmanager_url]
+            cache_file = self._cache_file_path(nsxmanager_url)
+            if cache_file:
+                with _CacheFileLock(cache_file):
+                    cached_token = self._read_cache_file(cache_file)
+                    if cached_token and cached_token[0] == token_value:
+                        self._remove_cache_file(cache_file)
+
+    def _get_shared_token(self, nsxmanager_url):
+        cache_file = self._cache_file_path(nsxmanager_url)
+        if not cache_file:
+            return self._request_token(nsxmanager_url)
+        # the lock makes concurrent processes wait for the first one to obtain a token, instead of each asking
+        # NSX Manager for a token of its own
+        with _CacheFileLock(cache_file):
+            token = self._read_cache_file(cache_file)
+            if not self._is_valid(token):
+                token = self._request_token(nsxmanager_url)
+                self._write_cache_file(cache_file, token)
+            return token
+
+    def _request_token(self, nsxmanager_url):
+        token_url = nsxmanager_url + TOKEN_URL_PATH
+        response = self._session.post(token_url, auth=(self._username, self._password),
+                                      params={'expiresInMinutes': self._token_lifetime}, timeout=self._timeout)
+        if response.status_code != 200:
+            raise errors.http_error_class(response.status_code)(response.status_code, response.content,
+                                                                response.headers, 'POST', token_url)
+        token_element = et.fromstring(response.content)
+        token_value = token_element.findtext('value')
+        assert token_value, 'NSX Manager did not return an auth token'
+        # expiresOn is returned in milliseconds since the epoch
+        token_expires = token_element.findtext('expiresOn')
+        if token_expires:
+            token_expires = int(token_expires) / 1000.0
+        else:
+            token_expires = time.time() + self._token_lifetime * 60
+        return token_value, token_expires
+
+    def _is_valid(self, token):
+        return bool(token) and token[1] - self._refresh_margin > time.time()
+
+    def _handle_401(self, response, **kwargs):
+        # NSX Manager rejected the token before its expiry, replace it and send the request once more
+        if response.status_code != 401 or getattr(response.request, '_nsx_token_retried', False):
+            return response
+        nsxmanager_url = self._nsxmanager_url(response.request.url)
+        self.invalidate_token(nsxmanager_url, response.request.headers['Authorization'].split(' ', 1)[-1])
+        response.content
+        response.close()
+        retried_request = response.request.copy()
+        retried_request.headers['Authorization'] = 'AUTHTOKEN {}'.format(self.get_token(nsxmanager_url))
+        retried_request._nsx_token_retried = True
+        retried_response = response.connection.send(retried_request, **kwargs)
+        retried_response.history.append(response)
+        retried_response.request = retried_request
+        return retried_response
+
+    def _cache_file_path(self, nsxmanager_url):
+        # the file name includes the password, so a process with wrong credentials never picks up a valid token
+        if self._cache_dir is False:
+            return None
+        cache_key = '{}:{}:{}'.format(nsxmanager_url, self._username, self._password)
+        return os.path.join(self._cache_dir, '{}.token'.format(hashlib.sha1(cache_key).hexdigest()))
+
+    @staticmethod
+    def _nsxmanager_url(url):
+        parsed_url = urlparse.urlsplit(url)
+        return '{}://{}'.format(parsed_url.scheme, parsed_url.netloc)
+
+    @staticmethod
+    def _read_cache_file(cache_file):
+        try:
+            with open(cache_file, 'rb') as cache_file_handle:
+                cached_token = json.load(cache_file_handle)
+            return cached_token['value'], cached_token['expires']
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return None
+
+    @staticmethod
+    def _write_cache_file(cache_file, token):
+        # failing to write the token cache is not an error, the next process will simply obtain its own token
+        cache_dir = os.path.dirname(cache_file)
+        try:
+            temp_fd, temp_file = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+            with os.fdopen(temp_fd, 'wb') as temp_file_handle:
+                json.dump({'value': token[0], 'expires': token[1]}, temp_file_handle)
+            os.rename(temp_file, cache_file)
+        except (IOError, OSError):
+            return
+
+    @staticmethod
+    def _remove_cache_file(cache_file):
+        try:
+            os.remove(cache_file)
+        except OSError:
+            return
+
+
+class _CacheFileLock(object):
+    # holds an exclusive advisory lock on the lock file of a token cache file, the lock is released by closing the
+    # file. The token cache directory is only readable by the user, as token cache files grant API access
+    def __init__(self, cache_file):
+        self._lock_file = cache_file + '.lock'
+        self._lock_file_handle = None
+
+    def __enter__(self):
+        cache_dir = os.path.dirname(self._lock_file)
+        try:
+            os.makedirs(cache_dir, 0700)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                return self
+        try:
+            self._lock_file_handle = open(self._lock_file, 'a')
+            if fcntl:
+                fcntl.flock(self._lock_file_handle.fileno(), fcntl.LOCK_EX)
+        except IOError:
+            self._lock_file_handle = None
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._lock_file_handle:
+            self._lock_file_handle.close()
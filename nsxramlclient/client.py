@@ -18,22 +18,37 @@
 
 __author__ = 'yfauser'
 
+import os
 import re
+import time
+import types
 import pprint
+import threading
 
 import pyraml.parser
+from concurrent import futures
 from lxml import etree as et
 
 import http_session
+import ramlcache
+import responsecache
+import throttle
 import xmloperations
 
 
 class NsxClient(object):
+    _method_options = {'read': 'get', 'create': 'post', 'delete': 'delete', 'update': 'put'}
+
     def __init__(self, raml_file, nsxmanager, nsx_username, nsx_password, debug=None, verify=None,
-                 suppress_warnings=None):
+                 suppress_warnings=None, raml_cache_dir=None, lazy_raml=None, pool_maxsize=None, pool_block=None,
+                 keep_alive=None, auth_token=None, token_cache_dir=None, retry_policy=None,
+                 rate_limit=None, resource_rate_limits=None, adaptive_concurrency=None, timeout=None,
+                 compression=None, coalesce_reads=None, response_cache=None, response_cache_ttls=None,
+                 circuit_breaker=None):
         """
         :param raml_file: This mandatory parameter is a RAML File used as the basis of all URL compossitions and
-                          to extract body schemas and convert them into python dictionaries
+                          to extract body schemas and convert them into python dictionaries. In place of the RAML
+                          File, a binding module generated from it by nsxramlclient.codegen can be passed
         :param nsxmanager: This mandatory parameter is either the hostname or IP Address of the NSX Manager
         :param nsx_username: This mandatory parameter is the Username on NSX Manager used to do API Calls
         :param nsx_password: This mandatory parameter is the Password of the User used to do API Calls
@@ -43,10 +58,50 @@ class NsxClient(object):
                Default: False
         :param suppress_warnings: Optional: If set to True, the client will print out a warning if NSX Manager uses
                a self signed certificate. Default: True
+        :param raml_cache_dir: Optional: Directory in which the compiled RAML File is cached, so that later sessions
+               using the same RAML File don't need to parse it again. Set to False to disable the cache.
+               Default: ~/.nsxramlclient/cache
+        :param lazy_raml: Optional: If set to True, resources and schemas are only read from the RAML cache when they
+               are first used, so that short lived scripts only pay for the resources they use. Default: False
+        :param pool_maxsize: Optional: The maximum number of connections to NSX Manager kept open for reuse. Set it
+               to the number of threads sharing the client. Default: 10
+        :param pool_block: Optional: If set to True, requests wait for a free connection when pool_maxsize
+               connections are in use, instead of opening a connection that is discarded afterwards. Default: False
+        :param keep_alive: Optional: If set to False, every connection is closed after its request. Default: True
+        :param auth_token: Optional: If set to True, the client obtains an NSX API auth token with the username and
+               password and uses it instead of basic credentials until shortly before it expires. Default: False
+        :param token_cache_dir: Optional: Directory in which auth tokens are shared between processes using the
+               same NSX Manager and credentials. Set to False to keep tokens in memory only.
+               Default: ~/.nsxramlclient/tokens
+        :param retry_policy: Optional: A retrypolicy.RetryPolicy deciding which failed requests are sent again and
+               when. Each client gets its own policy and retry budget by default. Default: RetryPolicy()
+        :param rate_limit: Optional: The number of requests per second the client sends at most. Default: None
+        :param resource_rate_limits: Optional: A dictionary of displayName prefixes and the number of requests per
+               second sent at most to the resources starting with the prefix, e.g. {'dfw': 2}. Default: None
+        :param adaptive_concurrency: Optional: If set to True, the number of concurrent requests is adapted to the
+               latency and error rate of NSX Manager. Pass a throttle.AdaptiveConcurrencyLimiter to tune the limits.
+               Default: False
+        :param timeout: Optional: The connect and read timeout of every request in seconds, as a number or a
+               (connect timeout, read timeout) tuple. Default: (10, 300)
+        :param compression: Optional: If set to True, the client sends request bodies larger than 16 KB gzip
+               compressed and only accepts gzip compressed responses. Responses are requested compressed either
+               way, as gzip or deflate. Default: False
+        :param coalesce_reads: Optional: If set to True, identical reads issued by several threads while the first
+               of them is in flight share its response, instead of each being sent to NSX Manager. Default: False
+        :param response_cache: Optional: If set to True, the client keeps the responses of reads with their ETag and
+               revalidates them with If-None-Match, so that NSX Manager answers 304 Not Modified instead of sending
+               unchanged objects again. Writes through the client drop the affected responses. Pass a
+               responsecache.ResponseCache to tune its size and time to live. Default: False
+        :param response_cache_ttls: Optional: A dictionary of displayName prefixes and the number of seconds the
+               responses of the resources starting with the prefix are cached, e.g. {'dfw': 30}. Default: None
+        :param circuit_breaker: Optional: If set to True, the client stops sending requests after 5 consecutive
+               connection failures, 5xx or 429 responses, and raises errors.NsxCircuitOpenError instead, until a
+               probe request sent after 30 seconds succeeds. Pass a throttle.CircuitBreaker to tune the thresholds,
+               add a latency budget, or share the breaker between the clients of one NSX Manager. Default: False
         :return: Returns a NsxClient Session Object
         """
         self._nsx_raml_file = raml_file
-        self._nsxraml = NsxRaml(self._nsx_raml_file, nsxmanager)
+        self._nsxraml = NsxRaml(self._nsx_raml_file, nsxmanager, raml_cache_dir, bool(lazy_raml))
         self._nsx_username = nsx_username
         self._nsx_password = nsx_password
         self._debug = debug
@@ -55,11 +110,41 @@ class NsxClient(object):
             self._suppress_warnings = suppress_warnings
         else:
             self._suppress_warnings = True
+        if rate_limit or resource_rate_limits:
+            rate_limiter = throttle.RateLimiter(rate_limit, resource_rates=resource_rate_limits)
+        else:
+            rate_limiter = None
+        if isinstance(adaptive_concurrency, throttle.AdaptiveConcurrencyLimiter):
+            concurrency_limiter = adaptive_concurrency
+        elif adaptive_concurrency:
+            concurrency_limiter = throttle.AdaptiveConcurrencyLimiter()
+        else:
+            concurrency_limiter = None
+        if isinstance(response_cache, responsecache.ResponseCache):
+            self._response_cache = response_cache
+        elif response_cache:
+            self._response_cache = responsecache.ResponseCache(resource_ttls=response_cache_ttls)
+        else:
+            self._response_cache = None
+        if isinstance(circuit_breaker, throttle.CircuitBreaker):
+            self._circuit_breaker = circuit_breaker
+        elif circuit_breaker:
+            self._circuit_breaker = throttle.CircuitBreaker()
+        else:
+            self._circuit_breaker = None
         self._httpsession = http_session.Session(self._nsx_username, self._nsx_password, self._debug, self._verify,
-                                                 self._suppress_warnings)
+                                                 self._suppress_warnings, pool_maxsize=pool_maxsize or 10,
+                                                 pool_block=bool(pool_block), keep_alive=keep_alive is not False,
+                                                 auth_token=bool(auth_token), token_cache_dir=token_cache_dir,
+                                                 retry_policy=retry_policy, rate_limiter=rate_limiter,
+                                                 concurrency_limiter=concurrency_limiter,
+                                                 timeout=timeout or http_session.DEFAULT_TIMEOUT,
+                                                 compression=bool(compression), coalesce_reads=bool(coalesce_reads),
+                                                 response_cache=self._response_cache,
+                                                 circuit_breaker=self._circuit_breaker)
 
     def read(self, searched_resource, uri_parameters=None, request_body_dict=None, query_parameters_dict=None,
-             additional_headers=None):
+             additional_headers=None, timeout=None, deadline=None):
         """
         This method is used to read a resource using the GET HTTP Method
         :param searched_resource: A valid display name in the RAML file matching the resource
@@ -69,13 +154,17 @@ class NsxClient(object):
         :param query_parameters_dict: A dictionary containing optional or mandatory query parameters
         :param additional_headers: a dictionary of additional Headers to send in your request, e.g. if-match used
                with the dfw calls
+        :param timeout: Optional: The connect and read timeout of the request in seconds, as a number or a
+               (connect timeout, read timeout) tuple. Default: the timeout of the client
+        :param deadline: Optional: The time, as returned by time.time(), by which the call including all retries
+               must have completed. Default: None
         :return: This method returns a dictionary containing the received header and body data
         """
         return self._request(searched_resource, 'get', uri_parameters, request_body_dict, query_parameters_dict,
-                             additional_headers)
+                             additional_headers, timeout, deadline)
 
     def create(self, searched_resource, uri_parameters=None, request_body_dict=None, query_parameters_dict=None,
-               additional_headers=None):
+               additional_headers=None, timeout=None, deadline=None):
         """
         This method is used to create a resource using the POST HTTP Method
         :param searched_resource: A valid display name in the RAML file matching the resource
@@ -85,14 +174,18 @@ class NsxClient(object):
         :param query_parameters_dict: A dictionary containing optional or mandatory query parameters
         :param additional_headers: a dictionary of additional Headers to send in your request, e.g. if-match used
                with the dfw calls
+        :param timeout: Optional: The connect and read timeout of the request in seconds, as a number or a
+               (connect timeout, read timeout) tuple. Default: the timeout of the client
+        :param deadline: Optional: The time, as returned by time.time(), by which the call including all retries
+               must have completed. Default: None
         :return: This method returns a dictionary containing the received header and body data
         NOTE: The _resource_url and _request_body are constructed and passed by the decorator function
         """
         return self._request(searched_resource, 'post', uri_parameters, request_body_dict, query_parameters_dict,
-                             additional_headers)
+                             additional_headers, timeout, deadline)
 
     def update(self, searched_resource, uri_parameters=None, request_body_dict=None, query_parameters_dict=None,
-               additional_headers=None):
+               additional_headers=None, timeout=None, deadline=None):
         """
         This method is used to update a resource using the PUT HTTP Method
         :param searched_resource: A valid display name in the RAML file matching the resource
@@ -102,14 +195,18 @@ class NsxClient(object):
         :param query_parameters_dict: A dictionary containing optional or mandatory query parameters
         :param additional_headers: a dictionary of additional Headers to send in your request, e.g. if-match used
                with the dfw calls
+        :param timeout: Optional: The connect and read timeout of the request in seconds, as a number or a
+               (connect timeout, read timeout) tuple. Default: the timeout of the client
+        :param deadline: Optional: The time, as returned by time.time(), by which the call including all retries
+               must have completed. Default: None
         :return: This method returns a dictionary containing the received header and body data
         NOTE: The _resource_url and _request_body are constructed and passed by the decorator function
         """
         return self._request(searched_resource, 'put', uri_parameters, request_body_dict, query_parameters_dict,
-                             additional_headers)
+                             additional_headers, timeout, deadline)
 
     def delete(self, searched_resource, uri_parameters=None, request_body_dict=None, query_parameters_dict=None,
-               additional_headers=None):
+               additional_headers=None, timeout=None, deadline=None):
         """
         This method is used to delete a resource using the DELETE HTTP Method
         :param searched_resource: A valid display name in the RAML file matching the resource
@@ -119,55 +216,215 @@ class NsxClient(object):
         :param query_parameters_dict: A dictionary containing optional or mandatory query parameters
         :param additional_headers: a dictionary of additional Headers to send in your request, e.g. if-match used
                with the dfw calls
+        :param timeout: Optional: The connect and read timeout of the request in seconds, as a number or a
+               (connect timeout, read timeout) tuple. Default: the timeout of the client
+        :param deadline: Optional: The time, as returned by time.time(), by which the call including all retries
+               must have completed. Default: None
         :return: This method returns a dictionary containing the received header and body data
         NOTE: The _resource_url and _request_body are constructed and passed by the decorator function
         """
         return self._request(searched_resource, 'delete', uri_parameters, request_body_dict, query_parameters_dict,
-                             additional_headers)
+                             additional_headers, timeout, deadline)
 
-    def _request(self, searched_resource, method, uri_parameters=None, request_body_dict=None,
-                 query_parameters_dict=None, additional_headers=None):
-        found_res_object = self._nsxraml.find_resource_recursively(searched_resource)
-        assert found_res_object, 'The searched displayName could not be found in RAML File'
+    def read_stream(self, searched_resource, tags, uri_parameters=None, query_parameters_dict=None,
+                    additional_headers=None, timeout=None, deadline=None):
+        """
+        This method reads a resource using the GET HTTP Method, and returns the elements with the given tags while
+        the response is received. Only one element is held in memory at a time, which keeps the memory bounded when
+        reading large documents like a complete DFW configuration
+        :param searched_resource: A valid display name in the RAML file matching the resource
+        :param tags: The tags of the elements to return, e.g. ('section',) or ('rule',) for dfwConfig. Elements
+               nested in a returned element are part of its dictionary
+        :param uri_parameters: A dictionary with the URI Parameters expected by the resource
+        :param query_parameters_dict: A dictionary containing optional or mandatory query parameters
+        :param additional_headers: a dictionary of additional Headers to send in your request
+        :param timeout: Optional: The connect and read timeout of the request in seconds, as a number or a
+               (connect timeout, read timeout) tuple. Default: the timeout of the client
+        :param deadline: Optional: The time, as returned by time.time(), by which the response must have started.
+               Default: None
+        :return: This method returns a generator of dictionaries, one for each element with one of the tags, e.g.
+                 {'section': {'@id': '1001', 'rule': [...]}}
+        """
+        return self.prepare(searched_resource, 'get').stream(tags, uri_parameters, query_parameters_dict,
+                                                             additional_headers, timeout, deadline)
 
-        self._nsxraml.check_resource_methods_by_displayname(searched_resource, method)
-        resource_url = self._nsxraml.contruct_resource_url(searched_resource, uri_parameters)
-        query_parameters = self._nsxraml.get_method_mandatory_query_parameters(searched_resource, method)
+    def download(self, searched_resource, sink, uri_parameters=None, query_parameters_dict=None,
+                 additional_headers=None, progress_callback=None, resume=None, timeout=None, deadline=None):
+        """
+        This method reads a resource using the GET HTTP Method, and writes the response body to a file in chunks
+        while it is received. Use it for large non XML responses like controller tech support logs. If the
+        connection fails, the download continues from the last byte received, as long as the body did not change
+        :param searched_resource: A valid display name in the RAML file matching the resource
+        :param sink: The path of the file to write to, or a file like object with a write method
+        :param uri_parameters: A dictionary with the URI Parameters expected by the resource
+        :param query_parameters_dict: A dictionary containing optional or mandatory query parameters
+        :param additional_headers: a dictionary of additional Headers to send in your request
+        :param progress_callback: Optional: A function called after every chunk with the number of bytes downloaded
+               and the total number of bytes, or None if NSX Manager did not report the size. Default: None
+        :param resume: Optional: If set to True and sink is a file left by an interrupted download, the download
+               continues at the end of the file if NSX Manager confirms, with the ETag or Last-Modified header kept
+               in the file sink + '.resume', that the body did not change. Default: False
+        :param timeout: Optional: The connect and read timeout of the requests in seconds, as a number or a
+               (connect timeout, read timeout) tuple. Default: the timeout of the client
+        :param deadline: Optional: The time, as returned by time.time(), by which the download must have
+               completed. Default: None
+        :return: This method returns the number of bytes of the downloaded body
+        """
+        return self.prepare(searched_resource, 'get').download(sink, uri_parameters, query_parameters_dict,
+                                                               additional_headers, progress_callback, resume,
+                                                               timeout, deadline)
 
-        if request_body_dict:
-            request_body = xmloperations.dict_to_xml(request_body_dict)
-        else:
-            request_body = None
+    def execute_many(self, operations, max_workers=10, ordered=True, timeout=None, deadline=None):
+        """
+        This method sends many independent calls concurrently on a bounded pool of threads sharing the session of
+        the client. A failed call does not stop the others, its error is returned with its result
+        :param operations: A list or iterator of tuples (searched_resource, method, uri_parameters,
+               request_body_dict, query_parameters_dict, additional_headers), where all items after the method are
+               optional and the method is 'read', 'create', 'update' or 'delete' or the HTTP method
+        :param max_workers: Optional: The number of calls sent at the same time. Keep it at or below the pool_maxsize
+               of the client, so every call reuses an open connection. Default: 10
+        :param ordered: Optional: If set to True, the results are returned in the order of the operations, otherwise
+               as soon as each call completes. Default: True
+        :param timeout: Optional: The connect and read timeout of each call, see read. Default: None
+        :param deadline: Optional: The time, as returned by time.time(), by which every call must have completed.
+               Default: None
+        :return: This method returns a generator of a BatchResult for each operation, holding the index of the
+                 operation, the operation, the response or the error, and the time the call took
+        """
+        executor = futures.ThreadPoolExecutor(max_workers=max_workers)
+        # only a window of operations is taken from the iterator at a time, so an iterator of any length can be
+        # passed, and results waiting for a slower predecessor in ordered mode stay bounded
+        window_size = max_workers * 2
+        operations = enumerate(operations)
+        operations_exhausted = False
+        pending_calls = {}
+        completed_results = {}
+        next_result_index = 0
+        try:
+            while True:
+                while not operations_exhausted and len(pending_calls) + len(completed_results) < window_size:
+                    try:
+                        index, operation = next(operations)
+                    except StopIteration:
+                        operations_exhausted = True
+                        break
+                    pending_calls[executor.submit(self._execute_batch_operation, index, operation, timeout,
+                                                  deadline)] = index
+                if not pending_calls:
+                    break
 
-        if query_parameters_dict:
-            resource_url = self._nsxraml.add_query_parameter_url(resource_url, searched_resource, method,
-                                                                 query_parameters_dict)
-        else:
-            assert not query_parameters, 'missing mandatory query parameter {}'.format(query_parameters)
+                done_calls = futures.wait(pending_calls, return_when=futures.FIRST_COMPLETED)[0]
+                for done_call in done_calls:
+                    del pending_calls[done_call]
+                    if ordered:
+                        completed_results[done_call.result().index] = done_call.result()
+                    else:
+                        yield done_call.result()
+                while next_result_index in completed_results:
+                    yield completed_results.pop(next_result_index)
+                    next_result_index += 1
+        finally:
+            executor.shutdown(wait=False)
 
-        mandatory_add_headers = self._nsxraml.get_method_mandatory_add_headers(searched_resource, method)
+    def map(self, searched_resource, method, uri_parameters_list, request_body_dict=None, query_parameters_dict=None,
+            additional_headers=None, max_workers=10, ordered=True, timeout=None, deadline=None):
+        """
+        This method sends the same operation for many URI parameter sets concurrently, see execute_many
+        :param searched_resource: A valid display name in the RAML file matching the resource
+        :param method: The client operation ('read', 'create', 'update', 'delete') or the HTTP method
+        :param uri_parameters_list: A list or iterator of URI parameter dictionaries, one call is sent for each
+        :param request_body_dict: Optional: The body sent with every call. Default: None
+        :param query_parameters_dict: Optional: The query parameters sent with every call. Default: None
+        :param additional_headers: Optional: The additional headers sent with every call. Default: None
+        :return: This method returns a generator of a BatchResult for each URI parameter set
+        """
+        return self.execute_many(((searched_resource, method, uri_parameters, request_body_dict,
+                                   query_parameters_dict, additional_headers)
+                                  for uri_parameters in uri_parameters_list),
+                                 max_workers=max_workers, ordered=ordered, timeout=timeout, deadline=deadline)
 
-        if additional_headers:
-            assert set(mandatory_add_headers).issubset(set(additional_headers.keys())), \
-                'missing mandatory additonal headers {}'.format(mandatory_add_headers)
-            headers = additional_headers
-        else:
-            assert mandatory_add_headers is None, 'missing mandatory additonal headers {}'.format(mandatory_add_headers)
-            headers = None
+    def _execute_batch_operation(self, index, operation, timeout, deadline):
+        # runs on a worker thread, any error is returned with the result so the other operations carry on
+        call_start = time.time()
+        try:
+            searched_resource, method = operation[:2]
+            call_arguments = (tuple(operation[2:]) + (None,) * 4)[:4]
+            response = self.prepare(searched_resource, method)(*(call_arguments + (timeout, deadline)))
+            return BatchResult(index, operation, response, None, time.time() - call_start)
+        except Exception as e:
+            return BatchResult(index, operation, None, e, time.time() - call_start)
 
-        response = self._httpsession.do_request(method, resource_url, data=request_body, headers=headers)
+    def _request(self, searched_resource, method, uri_parameters=None, request_body_dict=None,
+                 query_parameters_dict=None, additional_headers=None, timeout=None, deadline=None):
+        response = self.prepare(searched_resource, method)(uri_parameters, request_body_dict, query_parameters_dict,
+                                                           additional_headers, timeout, deadline)
 
         # TODO: Add a check for mandatory body attributes (if needed)
 
         return response
 
+    def prepare(self, searched_resource, method):
+        """
+        This method resolves all RAML details of an operation once, and returns a reusable PreparedOperation.
+        Calling the PreparedOperation only composes the URL and sends the request, which makes it the fastest
+        way to issue the same operation many times
+        :param searched_resource: A valid display name in the RAML file matching the resource
+        :param method: The HTTP method ('get', 'post', 'put', 'delete') or the matching client operation ('read',
+               'create', 'update', 'delete')
+        :return: This method returns a PreparedOperation that is called with the uri_parameters, request_body_dict,
+                 query_parameters_dict and additional_headers arguments known from the read, create, update and
+                 delete methods
+        """
+        operation = self._nsxraml.resolve_operation(searched_resource, self._method_options.get(method, method))
+        return PreparedOperation(self._httpsession, self._nsxraml.base_uri, operation)
+
+    def _get_body_schema(self, searched_resource, method):
+        operation = self._nsxraml.resolve_operation(searched_resource, self._method_options.get(method, method))
+        return self._nsxraml.get_operation_body_schema(operation)
+
     def view_resource_body_schema(self, searched_resource, method):
-        xml_schema_result = self._nsxraml.get_xml_schema_by_displayname(searched_resource, method)
+        xml_schema_result = self._get_body_schema(searched_resource, method)
         print et.tostring(xml_schema_result, pretty_print=True)
 
     def extract_resource_body_schema(self, searched_resource, method):
-        xml_schema_result = self._nsxraml.get_xml_schema_by_displayname(searched_resource, method)
-        return xmloperations.xml_to_dict(xml_schema_result)
+        operation = self._nsxraml.resolve_operation(searched_resource, self._method_options.get(method, method))
+        return self._nsxraml.get_operation_body_template(operation)
+
+    def connection_stats(self):
+        """
+        This method reports how well the connections to NSX Manager are reused
+        :return: A dictionary with an entry per host, holding the number of requests sent, the number of
+                 connections opened and the number of requests that reused an open connection
+        """
+        return self._httpsession.connection_stats()
+
+    def transfer_stats(self):
+        """
+        This method reports the bytes transferred to and from NSX Manager, and the bytes saved by compression
+        :return: A dictionary with the request body bytes sent and saved, and the response body bytes received and
+                 saved
+        """
+        return self._httpsession.transfer_stats()
+
+    def response_cache_stats(self):
+        """
+        This method reports how many reads were answered from the response cache
+        :return: A dictionary with the number of reads answered with 304 Not Modified (hits), the number of reads
+                 answered with a full response (misses), the number of responses dropped by writes (invalidations)
+                 and the number of cached responses (entries), or None if the response cache is not enabled
+        """
+        if self._response_cache:
+            return self._response_cache.stats()
+
+    def circuit_breaker_stats(self):
+        """
+        This method reports the state of the circuit breaker, e.g. for schedulers to stop submitting calls while NSX
+        Manager is down
+        :return: A dictionary with the state ('closed', 'open' or 'half_open'), the number of consecutive failures,
+                 the number of times the breaker opened, the number of rejected requests and the time at which an
+                 open breaker lets a probe request through, or None if the circuit breaker is not enabled
+        """
+        return self._httpsession.circuit_breaker_stats()
 
     @staticmethod
     def view_response(ordered_dict):
@@ -206,10 +463,11 @@ class NsxClient(object):
         print ''.join(output_text)
 
     def read_all_pages(self, searched_resource, uri_parameters=None, request_body_dict=None,
-                       query_parameters_dict=None, additional_headers=None):
+                       query_parameters_dict=None, additional_headers=None, timeout=None, deadline=None):
+        # the deadline spans the requests of all pages
         supported_objects = ['virtualWires']
         first_page = self._request(searched_resource, 'get', uri_parameters, request_body_dict, query_parameters_dict,
-                                   additional_headers)['body']
+                                   additional_headers, timeout, deadline)['body']
         first_key = first_page.keys()[0]
         assert first_key in supported_objects, 'unsupported object {}, currently only {} ' \
                                                'are supported'.format(first_key, supported_objects)
@@ -231,7 +489,7 @@ class NsxClient(object):
             for page_start_index in range(start_index+page_size, total_count, page_size):
                 query_parameters_dict['startindex'] = str(page_start_index)
                 sub_page = self._request(searched_resource, 'get', uri_parameters, request_body_dict,
-                                         query_parameters_dict, additional_headers)['body']
+                                         query_parameters_dict, additional_headers, timeout, deadline)['body']
                 if isinstance(sub_page['virtualWires']['dataPage']['virtualWire'], dict):
                     collected_values.append(sub_page['virtualWires']['dataPage']['virtualWire'])
                 if isinstance(sub_page['virtualWires']['dataPage']['virtualWire'], list):
@@ -251,18 +509,260 @@ class NsxClient(object):
             return []
 
 
+class BatchResult(object):
+    __slots__ = ('index', 'operation', 'response', 'error', 'elapsed')
+
+    def __init__(self, index, operation, response, error, elapsed):
+        """
+        The outcome of one operation sent by NsxClient.execute_many
+        :param index: The position of the operation in the operations passed to execute_many
+        :param operation: The operation tuple as passed to execute_many
+        :param response: The dictionary containing the received header and body data, None if the call failed
+        :param error: The exception raised by the call, e.g. an errors.NsxError, None if the call succeeded
+        :param elapsed: The number of seconds the call took
+        """
+        self.index = index
+        self.operation = operation
+        self.response = response
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class ResourceSpec(object):
+    __slots__ = ('display_name', 'url_template', 'methods')
+
+    def __init__(self, display_name, url_template, methods):
+        """
+        The details of a resource needed to compose requests, without the documentation of the RAML File
+        :param display_name: The display name of the resource in the RAML file
+        :param url_template: The UrlTemplate of the resource
+        :param methods: A dictionary of HTTP methods to their MethodSpec
+        :return: Returns a ResourceSpec Object
+        """
+        self.display_name = display_name
+        self.url_template = url_template
+        self.methods = methods
+
+
+class MethodSpec(object):
+    __slots__ = ('query_parameters', 'headers', 'body_schema')
+
+    def __init__(self, query_parameters, headers, body_schema):
+        """
+        The details of a resource method needed to compose requests
+        :param query_parameters: A tuple of (name, required) tuples of the query parameters, or None
+        :param headers: A tuple of (name, required) tuples of the additional headers, or None
+        :param body_schema: The body schema reference of the method, ('inline', xml string) or ('external', name),
+               or None if the method has no body schema
+        :return: Returns a MethodSpec Object
+        """
+        self.query_parameters = query_parameters
+        self.headers = headers
+        self.body_schema = body_schema
+
+
+class OperationDescriptor(object):
+    __slots__ = ('display_name', 'method', 'url_template', 'query_parameters', 'mandatory_query_parameters',
+                 'headers', 'mandatory_add_headers', 'body_schema')
+
+    def __init__(self, display_name, method, url_template, query_parameters, headers, body_schema):
+        """
+        All RAML details needed to send one method of a resource. Use NsxRaml.resolve_operation to create it
+        :param display_name: The display name of the resource in the RAML file
+        :param method: The HTTP method of the operation
+        :param url_template: The UrlTemplate of the resource
+        :param query_parameters: A tuple of (name, required) tuples of the query parameters, or None
+        :param headers: A tuple of (name, required) tuples of the additional headers, or None
+        :param body_schema: The body schema reference of the method, ('inline', xml string) or ('external', name),
+               or None if the method has no body schema
+        :return: Returns a OperationDescriptor Object
+        """
+        self.display_name = display_name
+        self.method = method
+        self.url_template = url_template
+        self.query_parameters = query_parameters
+        self.headers = headers
+        self.body_schema = body_schema
+        # like the get_method_mandatory_* methods of NsxRaml, None means the method declares no parameters at all
+        self.mandatory_query_parameters = None
+        if query_parameters:
+            self.mandatory_query_parameters = [name for name, required in query_parameters if required]
+        self.mandatory_add_headers = None
+        if headers:
+            self.mandatory_add_headers = [name for name, required in headers if required]
+
+
+class PreparedOperation(object):
+    __slots__ = ('_httpsession', '_base_uri', '_operation')
+
+    def __init__(self, httpsession, base_uri, operation):
+        """
+        An operation on a resource with all details from the RAML file resolved. Use NsxClient.prepare to create it
+        :param httpsession: The http_session.Session used to send the requests
+        :param base_uri: The base URI of the NSX Manager the requests are sent to
+        :param operation: The OperationDescriptor as returned by NsxRaml.resolve_operation
+        :return: Returns a PreparedOperation Object
+        """
+        self._httpsession = httpsession
+        self._base_uri = base_uri
+        self._operation = operation
+
+    @property
+    def display_name(self):
+        return self._operation.display_name
+
+    @property
+    def method(self):
+        return self._operation.method
+
+    def url(self, uri_parameters=None, query_parameters_dict=None):
+        """
+        Compose the URL of the operation
+        :param uri_parameters: A dictionary with the URI Parameters expected by the resource
+        :param query_parameters_dict: A dictionary containing optional or mandatory query parameters
+        :return: The resource URL including the query parameters
+        """
+        resource_url = self._base_uri + self._operation.url_template.render(uri_parameters)
+        if query_parameters_dict:
+            missing_mandatory_qparameters = [parameter for parameter in
+                                             self._operation.mandatory_query_parameters or []
+                                             if parameter not in query_parameters_dict]
+            assert len(missing_mandatory_qparameters) == 0, 'Missing required query ' \
+                                                            'parameters : {}'.format(missing_mandatory_qparameters)
+            resource_url = '{}?{}'.format(resource_url, ''.join('&{}={}'.format(query_parameter, query_value)
+                                                                for query_parameter, query_value
+                                                                in query_parameters_dict.items()))
+        else:
+            assert not self._operation.mandatory_query_parameters, \
+                'missing mandatory query parameter {}'.format(self._operation.mandatory_query_parameters)
+        return resource_url
+
+    def __call__(self, uri_parameters=None, request_body_dict=None, query_parameters_dict=None,
+                 additional_headers=None, timeout=None, deadline=None):
+        """
+        Send the operation to NSX Manager
+        :param uri_parameters: A dictionary with the URI Parameters expected by the resource
+        :param request_body_dict: A dictionary containing the body parameter in the format
+               {'baseObject': {nested parameters}}. You can use extract_resource_body_schema to create it
+        :param query_parameters_dict: A dictionary containing optional or mandatory query parameters
+        :param additional_headers: a dictionary of additional Headers to send in your request, e.g. if-match used
+               with the dfw calls
+        :param timeout: Optional: The connect and read timeout of the request in seconds, as a number or a
+               (connect timeout, read timeout) tuple. Default: the timeout of the client
+        :param deadline: Optional: The time, as returned by time.time(), by which the call including all retries
+               must have completed. Default: None
+        :return: This method returns a dictionary containing the received header and body data
+        """
+        resource_url = self.url(uri_parameters, query_parameters_dict)
+
+        if request_body_dict:
+            request_body = xmloperations.dict_to_xml(request_body_dict)
+        else:
+            request_body = None
+
+        return self._httpsession.do_request(self._operation.method, resource_url, data=request_body,
+                                            headers=self._get_headers(additional_headers),
+                                            resource_name=self._operation.display_name, timeout=timeout,
+                                            deadline=deadline)
+
+    def stream(self, tags, uri_parameters=None, query_parameters_dict=None, additional_headers=None, timeout=None,
+               deadline=None):
+        """
+        Send the operation to NSX Manager and parse the XML response while it is received
+        :param tags: The tags of the response elements to return, e.g. ('section',) or ('rule',) for dfwConfig
+        :param uri_parameters: A dictionary with the URI Parameters expected by the resource
+        :param query_parameters_dict: A dictionary containing optional or mandatory query parameters
+        :param additional_headers: a dictionary of additional Headers to send in your request
+        :param timeout: Optional: The connect and read timeout of the request in seconds, as a number or a
+               (connect timeout, read timeout) tuple. Default: the timeout of the client
+        :param deadline: Optional: The time, as returned by time.time(), by which the response must have started.
+               Default: None
+        :return: A generator of dictionaries, one for each element with one of the tags
+        """
+        resource_url = self.url(uri_parameters, query_parameters_dict)
+        return self._httpsession.do_stream_request(self._operation.method, resource_url, tags,
+                                                   headers=self._get_headers(additional_headers),
+                                                   resource_name=self._operation.display_name, timeout=timeout,
+                                                   deadline=deadline)
+
+    def download(self, sink, uri_parameters=None, query_parameters_dict=None, additional_headers=None,
+                 progress_callback=None, resume=None, timeout=None, deadline=None):
+        """
+        Send the operation to NSX Manager and write the response body to a file while it is received
+        :param sink: The path of the file to write to, or a file like object with a write method
+        :param uri_parameters: A dictionary with the URI Parameters expected by the resource
+        :param query_parameters_dict: A dictionary containing optional or mandatory query parameters
+        :param additional_headers: a dictionary of additional Headers to send in your request
+        :param progress_callback: Optional: A function called with the number of bytes downloaded and the total
+               number of bytes, or None if NSX Manager did not report the size. Default: None
+        :param resume: Optional: If set to True, the download of a file left by an interrupted download continues
+               at its end if the body did not change. Default: False
+        :param timeout: Optional: The connect and read timeout of the requests in seconds, as a number or a
+               (connect timeout, read timeout) tuple. Default: the timeout of the client
+        :param deadline: Optional: The time, as returned by time.time(), by which the download must have
+               completed. Default: None
+        :return: The number of bytes of the downloaded body
+        """
+        resource_url = self.url(uri_parameters, query_parameters_dict)
+        return self._httpsession.do_download(self._operation.method, resource_url, sink,
+                                             headers=self._get_headers(additional_headers),
+                                             resource_name=self._operation.display_name, timeout=timeout,
+                                             deadline=deadline, resume=bool(resume),
+                                             progress_callback=progress_callback)
+
+    def _get_headers(self, additional_headers):
+        mandatory_add_headers = self._operation.mandatory_add_headers
+        if additional_headers:
+            assert set(mandatory_add_headers or []).issubset(additional_headers), \
+                'missing mandatory additonal headers {}'.format(mandatory_add_headers)
+            return additional_headers
+        else:
+            assert not mandatory_add_headers, 'missing mandatory additonal headers {}'.format(mandatory_add_headers)
+            return None
+
+
 class NsxRaml(object):
-    def __init__(self, raml_file, nsxmanager):
-        self._nsxraml = pyraml.parser.load(raml_file)
-        self._base_uri = re.sub('\{nsxmanager\}', nsxmanager, self._nsxraml.baseUri)
+    def __init__(self, raml_file, nsxmanager, cache_dir=None, lazy=False):
+        """
+        :param raml_file: The RAML File describing the NSX API, or a binding module generated by nsxramlclient.codegen
+        :param nsxmanager: The hostname or IP Address of the NSX Manager, substituted in the RAML base URI
+        :param cache_dir: Optional: Directory in which the compiled RAML File is cached between runs. Set to False
+               to always parse the RAML File. Default: ~/.nsxramlclient/cache
+        :param lazy: Optional: If set to True, resources and schemas are only read from the cache when they are
+               first used. Default: False
+        :return: Returns a NsxRaml Object
+        """
+        # the compiled RAML is shared by all NsxRaml Objects using the same RAML File, only the base URI
+        # is specific to the NSX Manager
+        self._compiled_raml = CompiledRaml.get_shared(raml_file, cache_dir, lazy)
+        self._base_uri = re.sub('\{nsxmanager\}', nsxmanager, self._compiled_raml.base_uri)
+
+    @property
+    def _nsxraml(self):
+        return self._compiled_raml.raml_tree
+
+    @property
+    def base_uri(self):
+        return self._base_uri
+
+    def resource_exists(self, display_name):
+        return self._compiled_raml.has_resource(display_name)
+
+    def get_resource_url_template(self, display_name):
+        return self._compiled_raml.get_resource(display_name).url_template
 
     def find_resource_recursively(self, display_name, raml_resource_root=None):
-        # this method runs through the base raml file recursively until it finds the first
+        # lookups from the root of the raml file are answered by the display name index, lookups
+        # starting from a sub resource still run through the raml file recursively until they find the first
         # occurrence of the searched displayName in the resource
-        if raml_resource_root:
-            searched_tuples = raml_resource_root.resources.items()
+        if not raml_resource_root or raml_resource_root is self._nsxraml:
+            return self._compiled_raml.display_name_index.get(str(display_name))
         else:
-            searched_tuples = self._nsxraml.resources.items()
+            searched_tuples = raml_resource_root.resources.items()
 
         for resource_tuple in searched_tuples:
             if resource_tuple[1].displayName == str(display_name):
@@ -272,72 +772,36 @@ class NsxRaml(object):
                 if recursive_result:
                     return recursive_result
 
-    def contruct_resource_url(self, display_name, uri_parameters):
-        found_resource = self.find_resource_recursively(display_name)
-        resource_url_data = self._get_resource_url_data(found_resource)
-        resource_url = self._base_uri + resource_url_data['constructed_url']
-
-        if len(resource_url_data['uri_parameters']) > 0:
-            assert uri_parameters, 'The resource requires dict uri_parameters to be passed as kwarg'
-            try:
-                resource_uri_params = [uri_parameter for uri_parameter in uri_parameters
-                                       if resource_url_data['uri_parameters'][uri_parameter].required]
-            except KeyError:
-                raise Exception('one of the passed URI parameter could not be found in RAMl File')
+    def resolve_operation(self, display_name, method):
+        return self._compiled_raml.resolve_operation(display_name, method)
 
-            for uri_parameter in resource_uri_params:
-                assert uri_parameter in uri_parameters.keys(), \
-                    'one required URI parameter is missing in the passed URI parameters, ' \
-                    'required parameters are {}'.format(resource_uri_params)
-                resource_url = re.sub('\{' + uri_parameter + '\}', uri_parameters[uri_parameter], resource_url)
+    def get_operation_body_schema(self, operation):
+        return self._compiled_raml.get_operation_body_schema(operation)
 
-        return resource_url
+    def get_operation_body_template(self, operation):
+        return self._compiled_raml.get_operation_body_template(operation)
 
-    def _get_resource_url_data(self, resource, res_url_data=None):
-        # this method runs through the base raml file backwards recursively to construct the
-        # url of the resource and collect all uri parameters back to the root
-        if not res_url_data:
-            res_url_data = {'constructed_url': '', 'uri_parameters': {}, 'query_parameters': {}}
-        if resource[1].parentResource:
-            try:
-                resource[1].parentResource.displayName
-            except:
-                raise Exception('The parent resource of {} is missing a display '
-                                'name in the RAMl File'.format(resource[0]))
-            parent_display_name = resource[1].parentResource.displayName
-            parent_resource = self.find_resource_recursively(parent_display_name, self._nsxraml)
-            res_url_data['constructed_url'] = resource[0] + res_url_data['constructed_url']
-            if resource[1].uriParameters:
-                res_url_data['uri_parameters'].update(resource[1].uriParameters)
-            return self._get_resource_url_data(parent_resource, res_url_data)
-        else:
-            res_url_data['constructed_url'] = resource[0] + res_url_data['constructed_url']
-            if resource[1].uriParameters:
-                res_url_data['uri_parameters'].update(resource[1].uriParameters)
-            return res_url_data
+    def contruct_resource_url(self, display_name, uri_parameters):
+        url_template = self._compiled_raml.get_resource(display_name).url_template
+        return self._base_uri + url_template.render(uri_parameters)
 
     def check_resource_methods_by_displayname(self, display_name, method):
-        found_res_object = self.find_resource_recursively(display_name)
-        assert method in found_res_object[1].methods, 'The resource does not have a {} method in the ' \
-                                                      'RAML File'.format(method.upper())
+        resource_methods = self._compiled_raml.get_resource(display_name).methods
+        assert method in resource_methods, 'The resource does not have a {} method in the ' \
+                                           'RAML File'.format(method.upper())
 
     def get_method_mandatory_query_parameters(self, display_name, method):
-        found_res_object = self.find_resource_recursively(display_name)
-        if found_res_object[1].methods[method].queryParameters:
-            return [parameter for parameter in found_res_object[1].methods[method].queryParameters.keys() if
-                    found_res_object[1].methods[method].queryParameters[parameter].required]
+        query_parameters = self._compiled_raml.get_resource(display_name).methods[method].query_parameters
+        if query_parameters:
+            return [parameter for parameter, required in query_parameters if required]
 
     def get_method_mandatory_add_headers(self, display_name, method):
-        found_res_object = self.find_resource_recursively(display_name)
-        if found_res_object[1].methods[method].headers:
-            return [header for header in found_res_object[1].methods[method].headers.keys() if
-                    found_res_object[1].methods[method].headers[header].required]
+        headers = self._compiled_raml.get_resource(display_name).methods[method].headers
+        if headers:
+            return [header for header, required in headers if required]
 
     def add_query_parameter_url(self, url, display_name, method, query_parameters_dict):
-        found_res_object = self.find_resource_recursively(display_name)
-        mandatory_query_parameters = [parameter for parameter in
-                                      found_res_object[1].methods[method].queryParameters.keys() if
-                                      found_res_object[1].methods[method].queryParameters[parameter].required]
+        mandatory_query_parameters = self.get_method_mandatory_query_parameters(display_name, method) or []
         missing_mandatory_qparameters = [parameter for parameter in mandatory_query_parameters if
                                          parameter not in query_parameters_dict.keys()]
         assert len(missing_mandatory_qparameters) == 0, 'Missing required query ' \
@@ -350,29 +814,10 @@ class NsxRaml(object):
 
     def get_xml_schema_by_displayname(self, display_name, method):
         method_options = {'read': 'get', 'create': 'post', 'delete': 'delete', 'update': 'put'}
-        matched_resource = self.find_resource_recursively(display_name)
-
-        assert matched_resource, 'The searched displayName could not be found in RAML File'
-        assert method_options[method] in matched_resource[1].methods, 'the resource does not support ' \
-                                                                      'the {} method'.format(method)
-        assert matched_resource[1].methods[method_options[method]].body, 'the resource does not have a ' \
-                                                                         'body schema in the RAML File'
-
-        matched_resource_body = matched_resource[1].methods[method_options[method]].body
-
-        base_et_element = type(et.Element('base'))
-
-        if isinstance(matched_resource_body['application/xml'].schema, base_et_element):
-            return matched_resource_body['application/xml'].schema
-        elif isinstance(matched_resource_body['application/xml'].schema, str):
-            assert matched_resource_body['application/xml'].schema in self._nsxraml.schemas.keys(), \
-                'the external schema {} could not be found in the schema list of the RAML File'.format(
-                    matched_resource_body['application/xml'].schema)
-            assert isinstance(self._nsxraml.schemas[matched_resource_body['application/xml'].schema],
-                              base_et_element), 'the external schema {} is likely ' \
-                                                'misformated'.format(matched_resource_body['application/xml'].schema)
-
-            return self._nsxraml.schemas[matched_resource_body['application/xml'].schema]
+        assert self.resource_exists(display_name), 'The searched displayName could not be found in RAML File'
+        assert method_options[method] in self._compiled_raml.get_resource(display_name).methods, \
+            'the resource does not support the {} method'.format(method)
+        return self.get_operation_body_schema(self.resolve_operation(display_name, method_options[method]))
 
     @staticmethod
     def _collect_resource_details(resource_tuple):
@@ -411,6 +856,9 @@ class NsxRaml(object):
         if display_names_dict is None:
             display_names_dict = {}
 
+        # the pyraml object tree parsed for the listing is released afterwards, unless it was already kept for
+        # recursive searches
+        release_raml_tree = not raml_resource_root and not self._compiled_raml.raml_tree_loaded
         if raml_resource_root:
             scanned_tuples = raml_resource_root.resources.items()
         else:
@@ -430,4 +878,350 @@ class NsxRaml(object):
                                                                      resources_details[0], resources_details[1],
                                                                      resources_details[2], resources_details[3])
 
+        if release_raml_tree:
+            self._compiled_raml.release_raml_tree()
         return display_names_dict
+
+
+class CompiledRaml(object):
+    _shared_compiled_ramls = {}
+    _shared_compiled_ramls_lock = threading.Lock()
+
+    def __init__(self, raml_file, compiled_raml):
+        """
+        The details of a RAML File needed to compose requests, independent of the NSX Manager they are sent to.
+        Use CompiledRaml.get_shared to get the CompiledRaml of a RAML File
+        :param raml_file: The RAML File that was compiled
+        :param compiled_raml: The compiled RAML as returned by _compile_raml or loaded from the cache
+        :return: Returns a CompiledRaml Object
+        """
+        self.raml_file = raml_file
+        self.base_uri = compiled_raml['base_uri']
+        self.schemas = compiled_raml['schemas']
+        self._compiled_resources = compiled_raml['resources']
+        self._resources = {}
+        self._raml_tree = None
+        self._display_name_index = None
+        self._parsed_schemas = {}
+        self._body_templates = {}
+        self._resolved_operations = {}
+
+    @classmethod
+    def get_shared(cls, raml_file, cache_dir=None, lazy=False):
+        """
+        Get the CompiledRaml of a RAML File shared by all users in the process with the same cache_dir and lazy
+        options. The RAML File is only loaded again when its modification time or size changed
+        :param raml_file: The RAML File describing the NSX API, or a binding module generated from it by
+               nsxramlclient.codegen
+        :param cache_dir: Optional: Directory in which the compiled RAML File is cached between runs, see load
+        :param lazy: Optional: Only read resources and schemas from the cache when they are first used, see load
+        :return: The shared CompiledRaml Object
+        """
+        if isinstance(raml_file, types.ModuleType):
+            registry_key = raml_file.__name__
+            raml_file_version = raml_file.RAML_DIGEST
+        else:
+            raml_file_stat = os.stat(raml_file)
+            raml_file_version = (raml_file_stat.st_mtime, raml_file_stat.st_size)
+            registry_key = (os.path.abspath(raml_file), cache_dir, bool(lazy))
+        with cls._shared_compiled_ramls_lock:
+            shared_compiled_raml = cls._shared_compiled_ramls.get(registry_key)
+            if shared_compiled_raml and shared_compiled_raml[0] == raml_file_version:
+                return shared_compiled_raml[1]
+            if isinstance(raml_file, types.ModuleType):
+                compiled_raml = cls.from_binding_module(raml_file)
+            else:
+                compiled_raml = cls.load(raml_file, cache_dir, lazy)
+            cls._shared_compiled_ramls[registry_key] = (raml_file_version, compiled_raml)
+            return compiled_raml
+
+    @classmethod
+    def load(cls, raml_file, cache_dir=None, lazy=False):
+        """
+        Load a RAML File from the cache, or parse and compile it and write the result to the cache
+        :param raml_file: The RAML File describing the NSX API
+        :param cache_dir: Optional: Directory in which the compiled RAML File is cached between runs. Set to False
+               to always parse the RAML File. Default: ~/.nsxramlclient/cache
+        :param lazy: Optional: If set to True, the cache file is memory mapped and only its index is read. Each
+               resource and schema is read from the cache file when it is first used. Without a cache file the
+               RAML File still needs to be parsed completely. Default: False
+        :return: Returns a new CompiledRaml Object
+        """
+        if cache_dir is not False:
+            cache_file = ramlcache.cache_file_path(raml_file, cache_dir)
+            compiled_raml = ramlcache.load(cache_file, lazy)
+            if compiled_raml:
+                return cls(raml_file, compiled_raml)
+
+        compiled_raml = cls.compile_raml_file(raml_file)
+        if cache_dir is not False:
+            ramlcache.store(cache_file, compiled_raml)
+        return cls(raml_file, compiled_raml)
+
+    @classmethod
+    def from_binding_module(cls, binding_module):
+        """
+        Create a CompiledRaml from a binding module generated by nsxramlclient.codegen, without reading the RAML File
+        :param binding_module: The imported binding module
+        :return: Returns a new CompiledRaml Object
+        """
+        assert binding_module.BINDING_FORMAT_VERSION == ramlcache.CACHE_FORMAT_VERSION, \
+            'the binding module {} was generated by an incompatible client version, please generate it ' \
+            'again'.format(binding_module.__name__)
+        # the binding module only names the RAML File, as it is usually generated on another machine
+        raml_file = binding_module.RAML_FILE
+        module_dir = os.path.dirname(getattr(binding_module, '__file__', None) or '')
+        if os.path.isfile(os.path.join(module_dir, raml_file)):
+            raml_file = os.path.join(module_dir, raml_file)
+        return cls(raml_file, {'base_uri': binding_module.BASE_URI, 'resources': binding_module.RESOURCES,
+                               'schemas': binding_module.SCHEMAS})
+
+    @classmethod
+    def compile_raml_file(cls, raml_file):
+        """
+        Parse and compile a RAML File
+        :param raml_file: The RAML File describing the NSX API
+        :return: The compiled RAML as dictionary of python builtin types, as stored in the cache
+        """
+        # the pyraml object tree, with all its descriptions and examples, is not kept once the RAML is compiled
+        return cls._compile_raml(pyraml.parser.load(raml_file))
+
+    def has_resource(self, display_name):
+        return str(display_name) in self._compiled_resources
+
+    def get_resource(self, display_name):
+        """
+        :param display_name: A display name in the RAML file
+        :return: The ResourceSpec of the resource, or None if the display name can't be found in the RAML File.
+                 The ResourceSpec is only created when the resource is first used
+        """
+        display_name = str(display_name)
+        try:
+            return self._resources[display_name]
+        except KeyError:
+            pass
+        compiled_resource = self._compiled_resources.get(display_name)
+        if not compiled_resource:
+            return None
+        resource = ResourceSpec(display_name, UrlTemplate.from_state(compiled_resource[0]),
+                                {method: MethodSpec(*compiled_method)
+                                 for method, compiled_method in compiled_resource[1].items()})
+        self._resources[display_name] = resource
+        return resource
+
+    @property
+    def raml_tree(self):
+        # the pyraml object tree is only parsed again when one of the documentation views or a recursive search
+        # needs it
+        if self._raml_tree is None:
+            assert os.path.isfile(self.raml_file), 'the RAML File {} is needed for this view or search, but can not ' \
+                                                   'be found'.format(self.raml_file)
+            self._raml_tree = pyraml.parser.load(self.raml_file)
+        return self._raml_tree
+
+    @property
+    def raml_tree_loaded(self):
+        return self._raml_tree is not None
+
+    def release_raml_tree(self):
+        # drops the pyraml object tree parsed for the documentation views, it is parsed again when needed
+        self._raml_tree = None
+        self._display_name_index = None
+
+    @property
+    def display_name_index(self):
+        if self._display_name_index is None:
+            display_name_index = {}
+            self._index_display_names(self.raml_tree, display_name_index)
+            self._display_name_index = display_name_index
+        return self._display_name_index
+
+    @classmethod
+    def _compile_raml(cls, raml_root):
+        # the compiled RAML only holds python builtin types, so that it can be written to the cache as is
+        compiled_resources = {}
+        cls._compile_resources(raml_root, compiled_resources)
+        base_et_element = type(et.Element('base'))
+        compiled_schemas = {}
+        for schema_name, schema in (raml_root.schemas or {}).items():
+            if isinstance(schema, base_et_element):
+                compiled_schemas[schema_name] = et.tostring(schema, with_tail=False)
+            else:
+                compiled_schemas[schema_name] = None
+        return {'base_uri': raml_root.baseUri, 'resources': compiled_resources, 'schemas': compiled_schemas}
+
+    @classmethod
+    def _compile_resources(cls, raml_resource_root, compiled_resources, parent_path='', parent_uri_parameters=None):
+        # this method runs once through the base raml file to compile the URL template and the method details
+        # of every displayName. The parent chain is resolved while walking down, so the URL and the uri
+        # parameters of the parents are known without searching the tree again. Only the first occurrence of a
+        # displayName in depth first order is kept, which is the same resource the recursive search returns
+        if not raml_resource_root.resources:
+            return
+        for resource_tuple in raml_resource_root.resources.items():
+            resource_path = parent_path + resource_tuple[0]
+            resource_uri_parameters = dict(parent_uri_parameters or {})
+            if resource_tuple[1].uriParameters:
+                resource_uri_parameters.update((name, bool(parameter and parameter.required)) for name, parameter
+                                               in resource_tuple[1].uriParameters.items())
+            if resource_tuple[1].displayName not in compiled_resources:
+                url_template = UrlTemplate(resource_path, resource_uri_parameters)
+                compiled_resources[resource_tuple[1].displayName] = (url_template.get_state(),
+                                                                     cls._compile_methods(resource_tuple[1]))
+            cls._compile_resources(resource_tuple[1], compiled_resources, resource_path, resource_uri_parameters)
+
+    @staticmethod
+    def _compile_methods(raml_resource):
+        # for each method the query parameters and headers are kept as tuples of (name, required), or None if the
+        # method does not declare any. The body schema is either ('inline', xml string) or ('external', name)
+        base_et_element = type(et.Element('base'))
+        compiled_methods = {}
+        for method_name, method in (raml_resource.methods or {}).items():
+            query_parameters = None
+            if method.queryParameters:
+                query_parameters = tuple((name, bool(parameter and parameter.required)) for name, parameter
+                                         in method.queryParameters.items())
+            headers = None
+            if method.headers:
+                headers = tuple((name, bool(header and header.required)) for name, header in method.headers.items())
+            body_schema = None
+            if method.body and 'application/xml' in method.body:
+                schema = method.body['application/xml'].schema
+                if isinstance(schema, base_et_element):
+                    body_schema = ('inline', et.tostring(schema, with_tail=False))
+                elif isinstance(schema, basestring):
+                    body_schema = ('external', schema)
+            compiled_methods[method_name] = (query_parameters, headers, body_schema)
+        return compiled_methods
+
+    @classmethod
+    def _index_display_names(cls, raml_resource_root, display_name_index):
+        # maps every displayName of the pyraml tree to its resource tuple, keeping the first occurrence in depth
+        # first order
+        if not raml_resource_root.resources:
+            return
+        for resource_tuple in raml_resource_root.resources.items():
+            if resource_tuple[1].displayName not in display_name_index:
+                display_name_index[resource_tuple[1].displayName] = resource_tuple
+            cls._index_display_names(resource_tuple[1], display_name_index)
+
+    def resolve_operation(self, display_name, method):
+        """
+        Resolve all RAML details of one method of a resource in a single lookup. The result is kept, so resolving
+        the same operation again is a dictionary lookup
+        :param display_name: A valid display name in the RAML file matching the resource
+        :param method: The HTTP method of the operation
+        :return: The OperationDescriptor of the operation
+        """
+        operation_key = (display_name, method)
+        try:
+            return self._resolved_operations[operation_key]
+        except KeyError:
+            pass
+
+        matched_resource = self.get_resource(display_name)
+        assert matched_resource, 'The searched displayName could not be found in RAML File'
+        assert method in matched_resource.methods, 'The resource does not have a {} method in the ' \
+                                                   'RAML File'.format(method.upper())
+        method_spec = matched_resource.methods[method]
+        operation = OperationDescriptor(matched_resource.display_name, method, matched_resource.url_template,
+                                        method_spec.query_parameters, method_spec.headers, method_spec.body_schema)
+        self._resolved_operations[operation_key] = operation
+        return operation
+
+    def get_operation_body_schema(self, operation):
+        """
+        :param operation: The OperationDescriptor as returned by resolve_operation
+        :return: The body schema of the operation as lxml Element
+        """
+        schema_key = self._get_body_schema_key(operation)
+        if schema_key not in self._parsed_schemas:
+            if operation.body_schema[0] == 'inline':
+                self._parsed_schemas[schema_key] = et.fromstring(operation.body_schema[1])
+            else:
+                self._parsed_schemas[schema_key] = et.fromstring(self.schemas[schema_key])
+        return self._parsed_schemas[schema_key]
+
+    def _get_body_schema_key(self, operation):
+        # inline schemas are keyed by their operation, external schemas by their name as they can be shared by
+        # many operations
+        body_schema = operation.body_schema
+        assert body_schema, 'the resource does not have a body schema in the RAML File'
+
+        if body_schema[0] == 'inline':
+            return operation.display_name, operation.method
+
+        assert body_schema[1] in self.schemas, \
+            'the external schema {} could not be found in the schema list of the RAML File'.format(body_schema[1])
+        assert self.schemas[body_schema[1]], 'the external schema {} is likely misformated'.format(body_schema[1])
+        return body_schema[1]
+
+    def get_operation_body_template(self, operation):
+        """
+        :param operation: The OperationDescriptor as returned by resolve_operation
+        :return: The body schema of the operation converted to a python dictionary. The schema is only converted
+                 the first time, every call returns an independent copy of that conversion
+        """
+        schema_key = self._get_body_schema_key(operation)
+        if schema_key not in self._body_templates:
+            self._body_templates[schema_key] = xmloperations.xml_to_dict(self.get_operation_body_schema(operation))
+        return xmloperations.copy_dict_tree(self._body_templates[schema_key])
+
+
+class UrlTemplate(object):
+    __slots__ = ('path', 'placeholders', 'uri_parameters', 'required_parameters', '_format_string',
+                 '_unfilled_placeholders')
+    _placeholder_pattern = re.compile(r'\{([^}]+)\}')
+
+    def __init__(self, path, uri_parameters=None):
+        """
+        A resource URL compiled once from the RAML file
+        :param path: The full path of the resource below the base URI, e.g. '/2.0/vdn/scopes/{scopeId}'
+        :param uri_parameters: A dictionary of all URI parameter names declared along the parent chain of the
+               resource, with a boolean telling if the parameter is required
+        :return: Returns a UrlTemplate Object
+        """
+        self.path = path
+        self.placeholders = tuple(self._placeholder_pattern.findall(path))
+        self.uri_parameters = frozenset(uri_parameters or {})
+        self.required_parameters = frozenset(name for name, required in (uri_parameters or {}).items() if required)
+        self._format_string = self._placeholder_pattern.sub(r'%(\1)s', path.replace('%', '%%'))
+        # placeholders without a passed value are left in the URL, as they always have been
+        self._unfilled_placeholders = {name: '{' + name + '}' for name in self.placeholders}
+
+    def get_state(self):
+        # the state only holds python builtin types, it is used to store the template in the compiled RAML cache
+        return (self.path, self.placeholders, tuple(sorted(self.uri_parameters)),
+                tuple(sorted(self.required_parameters)), self._format_string)
+
+    @classmethod
+    def from_state(cls, state):
+        url_template = cls.__new__(cls)
+        url_template.path, url_template.placeholders = state[0], state[1]
+        url_template.uri_parameters, url_template.required_parameters = frozenset(state[2]), frozenset(state[3])
+        url_template._format_string = state[4]
+        url_template._unfilled_placeholders = {name: '{' + name + '}' for name in url_template.placeholders}
+        return url_template
+
+    def render(self, uri_parameters=None):
+        """
+        Fill the template with the passed URI parameters
+        :param uri_parameters: A dictionary with the URI Parameters expected by the resource
+        :return: The resource path with all placeholders replaced by their values
+        """
+        if not self.uri_parameters:
+            return self.path
+
+        assert uri_parameters, 'The resource requires dict uri_parameters to be passed as kwarg'
+        if not self.uri_parameters.issuperset(uri_parameters):
+            raise Exception('one of the passed URI parameter could not be found in RAMl File')
+        assert self.required_parameters.issubset(uri_parameters), \
+            'one required URI parameter is missing in the passed URI parameters, ' \
+            'required parameters are {}'.format(sorted(self.required_parameters))
+
+        try:
+            return self._format_string % uri_parameters
+        except KeyError:
+            placeholder_values = dict(self._unfilled_placeholders)
+            placeholder_values.update(uri_parameters)
+            return self._format_string % placeholder_values
@@ -0,0 +1,83 @@
+# coding=utf-8
+#
+# Copyright © 2015 VMware, Inc. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+# to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+
+
+__author__ = 'yfauser'
+
+import os
+import argparse
+
+import nsxramlclient
+import ramlcache
+from client import CompiledRaml
+
+_binding_module_template = '''# coding=utf-8
+#
+# Python binding of the RAML File {raml_file_name}, generated by nsxramlclient.codegen {client_version}.
+# Don't edit this file, generate it again when the RAML File changes. Pass the imported module to NsxClient in place
+# of the RAML File, so that no RAML File needs to be parsed when the client starts. The RAML File itself is only
+# needed by the documentation views, it is looked up next to this module or in the working directory
+
+RAML_FILE = {raml_file!r}
+RAML_DIGEST = {raml_digest!r}
+BINDING_FORMAT_VERSION = {binding_format_version!r}
+
+BASE_URI = {base_uri!r}
+
+# displayName: ((path, placeholders, uri parameters, required uri parameters, url format string),
+#               {{method: (query parameters, headers, body schema)}})
+RESOURCES = {resources}
+
+SCHEMAS = {schemas}
+'''
+
+
+def generate_binding_module(raml_file, binding_file):
+    """
+    Generate a python module holding the compiled RAML File: the URL template, the parameters and the method set of
+    every display name, and the body schemas
+    :param raml_file: The RAML File describing the NSX API
+    :param binding_file: The python module file to write, e.g. 'nsxvapi_binding.py'
+    """
+    compiled_raml = CompiledRaml.compile_raml_file(raml_file)
+    binding_module = _binding_module_template.format(
+        raml_file_name=os.path.basename(raml_file), client_version=nsxramlclient.__version__,
+        raml_file=os.path.basename(raml_file), raml_digest=ramlcache.raml_file_digest(raml_file),
+        binding_format_version=ramlcache.CACHE_FORMAT_VERSION, base_uri=compiled_raml['base_uri'],
+        resources=_format_entries(compiled_raml['resources']), schemas=_format_entries(compiled_raml['schemas']))
+    with open(binding_file, 'w') as binding_file_handle:
+        binding_file_handle.write(binding_module)
+
+
+def _format_entries(entries):
+    # one entry per line, sorted by name, so that a new binding module can be diffed against the previous one
+    return '{{\n{}}}'.format(''.join('    {!r}: {!r},\n'.format(name, entries[name]) for name in sorted(entries)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a python binding module from a NSX RAML File, that '
+                                                 'NsxClient can use in place of the RAML File')
+    parser.add_argument('raml_file', help='the RAML File describing the NSX API')
+    parser.add_argument('binding_file', help='the python module to write, e.g. nsxvapi_binding.py')
+    args = parser.parse_args()
+
+    generate_binding_module(args.raml_file, args.binding_file)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+# coding=utf-8
+#
+# Copyright © 2015 VMware, Inc. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+# to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+
+
+
+__author__ = 'yfauser'
+
+from xml.parsers.expat import ExpatError
+from lxml import etree as et
+
+import xmloperations
+
+# the longest response text shown in error messages, error pages of proxies can be hundreds of KB
+MAX_RESPONSE_TEXT = 8192
+
+
+class NsxError(Exception):
+    """
+    Base class of the errors raised for failed API calls. Catch it to record a failed call and carry on with the
+    next one
+    """
+    def __init__(self, message, method=None, url=None, resource_name=None):
+        """
+        :param message: The error message
+        :param method: The HTTP method of the failed request
+        :param url: The URL of the failed request
+        :param resource_name: The displayName of the RAML resource of the failed request, if known
+        """
+        super(NsxError, self).__init__(message)
+        self.method = method
+        self.url = url
+        self.resource_name = resource_name
+
+    @property
+    def request_identity(self):
+        """
+        :return: The request as text for error messages, e.g. 'GET https://nsxmanager/api/2.0/vdn/scopes (vdnScopes)'
+        """
+        request_identity = '{} {}'.format(self.method, self.url)
+        if self.resource_name:
+            request_identity += ' ({})'.format(self.resource_name)
+        return request_identity
+
+
+class NsxConnectionError(NsxError):
+    """
+    NSX Manager could not be reached, or the connection failed before a response was received
+    """
+    def __init__(self, reason, method=None, url=None, resource_name=None):
+        """
+        :param reason: The exception raised by the HTTP library
+        """
+        self.reason = reason
+        super(NsxConnectionError, self).__init__('connection failed: {}'.format(reason), method, url,
+                                                 resource_name)
+
+    def __str__(self):
+        return '{} failed: {}'.format(self.request_identity, self.reason)
+
+
+class NsxTimeoutError(NsxConnectionError):
+    """
+    NSX Manager did not respond within the timeout, or the deadline of the call passed
+    """
+
+
+class NsxCircuitOpenError(NsxConnectionError):
+    """
+    The request was not sent, because the circuit breaker of the session is open after NSX Manager failed repeatedly
+    """
+    def __init__(self, retry_at, method=None, url=None, resource_name=None):
+        """
+        :param retry_at: The time, as returned by time.time(), at which the circuit breaker lets requests through
+               again, or None if it is not known
+        """
+        self.retry_at = retry_at
+        super(NsxCircuitOpenError, self).__init__('circuit breaker open, NSX Manager failed repeatedly', method, url,
+                                                  resource_name)
+
+
+class NsxHttpError(NsxError):
+    """
+    NSX Manager responded with an unsuccessful status code
+    """
+    def __init__(self, status_code, content=None, headers=None, method=None, url=None, resource_name=None):
+        """
+        :param status_code: The HTTP status code of the response
+        :param content: The response body as received
+        :param headers: The response headers
+        """
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self._body = None
+        self._response_text = None
+        super(NsxHttpError, self).__init__('receive bad status code {}'.format(status_code), method, url,
+                                           resource_name)
+
+    @property
+    def content_type(self):
+        return self.headers.get('content-type', '')
+
+    @property
+    def body(self):
+        """
+        :return: The response body converted to a python dictionary if NSX Manager returned XML, otherwise None.
+                 The body is converted when it is first used
+        """
+        if self._body is None and self.content and 'application/xml' in self.content_type:
+            try:
+                self._body = xmloperations.xml_to_dict(et.fromstring(self.content))
+            except et.XMLSyntaxError:
+                self._body = {}
+        return self._body or None
+
+    @property
+    def response_text(self):
+        """
+        :return: The response body formatted for humans, at most MAX_RESPONSE_TEXT characters. The text is only
+                 rendered when it is used, so that errors that are caught and counted cost no formatting
+        """
+        if self._response_text is None:
+            self._response_text = _render_response_text(self.content or '', self.content_type)
+        return self._response_text
+
+    @property
+    def _error(self):
+        # NSX Manager reports errors as <error><details/><errorCode/><moduleName/></error>
+        if isinstance(self.body, dict) and isinstance(self.body.get('error'), dict):
+            return self.body['error']
+        return {}
+
+    @property
+    def error_code(self):
+        """
+        :return: The NSX errorCode as integer, e.g. 202 if an object name is already in use, or None
+        """
+        error_code = self._error.get('errorCode')
+        try:
+            return int(error_code)
+        except (TypeError, ValueError):
+            return error_code
+
+    @property
+    def error_details(self):
+        """
+        :return: The details text of the NSX error, or None
+        """
+        return self._error.get('details')
+
+    @property
+    def module_name(self):
+        """
+        :return: The NSX Manager module that reported the error, or None
+        """
+        return self._error.get('moduleName')
+
+    def __str__(self):
+        error_message = 'receive bad status code {} for {}'.format(self.status_code, self.request_identity)
+        if self.error_code is not None:
+            error_message += ', NSX error code {}'.format(_encode_text(self.error_code))
+        if self.response_text:
+            error_message += '\n{}'.format(self.response_text)
+        return error_message
+
+
+class NsxClientError(NsxHttpError):
+    """
+    NSX Manager rejected the request with a 4xx status code
+    """
+
+
+class NsxAuthenticationError(NsxClientError):
+    """
+    NSX Manager rejected the credentials or the auth token (401), or the user lacks the permission (403)
+    """
+
+
+class NsxNotFoundError(NsxClientError):
+    """
+    The object of the request does not exist (404)
+    """
+
+
+class NsxServerError(NsxHttpError):
+    """
+    NSX Manager failed to process the request with a 5xx status code
+    """
+
+
+def http_error_class(status_code):
+    """
+    :param status_code: An unsuccessful HTTP status code
+    :return: The most specific NsxHttpError subclass for the status code
+    """
+    if status_code in (401, 403):
+        return NsxAuthenticationError
+    if status_code == 404:
+        return NsxNotFoundError
+    if 400 <= status_code < 500:
+        return NsxClientError
+    if status_code >= 500:
+        return NsxServerError
+    return NsxHttpError
+
+
+def _render_response_text(content, content_type):
+    if 'text/html' in content_type:
+        response_text = xmloperations.html_to_text(content, max_length=MAX_RESPONSE_TEXT * 8)
+    elif 'application/xml' in content_type and len(content) <= MAX_RESPONSE_TEXT * 8:
+        try:
+            response_text = xmloperations.pretty_xml(content)
+        except ExpatError:
+            response_text = content
+    else:
+        response_text = content
+    # __str__ of the error must not fail on non ASCII text, like the details of an error in a localized NSX Manager
+    response_text = _encode_text(response_text)
+    if len(response_text) > MAX_RESPONSE_TEXT:
+        response_text = '{}\n... {} more characters'.format(response_text[:MAX_RESPONSE_TEXT],
+                                                            len(response_text) - MAX_RESPONSE_TEXT)
+    return response_text
+
+
+def _encode_text(text):
+    if isinstance(text, unicode):
+        return text.encode('utf-8', 'replace')
+    return text
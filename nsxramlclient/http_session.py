@@ -19,47 +19,177 @@
 __author__ = 'yfauser'
 
 import xml.dom.minidom as md
-import sys
+import os
+import re
 import time
-from functools import wraps
+import zlib
+import threading
 from collections import OrderedDict
 
 import requests
 from lxml import etree as et
-import OpenSSL.SSL
 
 import xmloperations
+import authtoken
+import retrypolicy
+import throttle
+import errors
+import responsecache
 
+_content_range_total = re.compile(r'/(\d+)$')
 
-def retry(catchexception, tries=4, wait=3, backofftime=2):
-    def retry_decorator(f):
-        @wraps(f)
-        def function_retry(*args, **kwargs):
-            innertries = tries
-            innerwait = wait
-            while innertries > 1:
-                try:
-                    return f(*args, **kwargs)
-                except catchexception, e:
-                    print 'Error {} occured, retry in {} seconds'.format(str(e), innerwait)
-                    time.sleep(innerwait)
-                    innerwait *= backofftime
-                    innertries -= 1
-            return f(*args, **kwargs)
-        return function_retry
-    return retry_decorator
+# connect and read timeout in seconds, NSX Manager takes minutes for some calls like DFW publishes on large rule sets
+DEFAULT_TIMEOUT = (10, 300)
+
+
+class SingleFlight(object):
+    """
+    Lets concurrent identical calls share one execution: the first caller of a key runs the call, callers of the
+    same key arriving while it runs wait for it and receive a copy of its result, or its error. If the call timed out
+    or was rejected by the circuit breaker, waiting callers whose deadline has not passed run the call again
+    """
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function, arguments, deadline=None, resource_name=None):
+        """
+        :param key: Calls with equal keys are coalesced
+        :param function: The function running the call
+        :param arguments: The arguments passed to the function
+        :param deadline: The time, as returned by time.time(), after which a waiting caller gives up
+        :param resource_name: The displayName of the RAML resource, used to identify the call in errors
+        :return: The result of the function, waiting callers receive a copy of the response body
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _InFlightCall()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            wait_time = max(deadline - time.time(), 0) if deadline else None
+            if not call.done.wait(wait_time):
+                raise errors.NsxTimeoutError('deadline passed while waiting for an identical request', 'GET', key[0],
+                                             resource_name)
+            if isinstance(call.error, (errors.NsxTimeoutError, errors.NsxCircuitOpenError)):
+                # the first caller may have given up on its own shorter timeout or deadline, callers with time
+                # left send the request again, coalesced among themselves
+                if deadline and time.time() >= deadline:
+                    raise call.error
+                return self.do(key, function, arguments, deadline, resource_name)
+            if call.error:
+                raise call.error
+            return responsecache.copy_response(call.result)
+
+        # the waiting callers copy a snapshot taken before the first caller receives the result, as callers
+        # commonly edit a read body to send it back. No caller can join once the call is removed
+        removed = False
+        try:
+            result = function(*arguments)
+            with self._lock:
+                del self._calls[key]
+                removed = True
+                waiters = call.waiters
+            if waiters:
+                call.result = responsecache.copy_response(result)
+            return result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            if not removed:
+                with self._lock:
+                    del self._calls[key]
+            call.done.set()
+
+
+class _InFlightCall(object):
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
 
 
 class Session(object):
-    def __init__(self, username='admin', password='default', debug=False, verify=False, suppress_warnings=False):
+    def __init__(self, username='admin', password='default', debug=False, verify=False, suppress_warnings=False,
+                 pool_maxsize=10, pool_block=False, keep_alive=True, auth_token=False, token_cache_dir=None,
+                 retry_policy=None, rate_limiter=None, concurrency_limiter=None, timeout=DEFAULT_TIMEOUT,
+                 compression=False, compress_threshold=16384, coalesce_reads=False, response_cache=None,
+                 circuit_breaker=None):
+        """
+        :param username: The Username on NSX Manager used to do API Calls
+        :param password: The Password of the User used to do API Calls
+        :param debug: If set to True, the session prints extensive HTTP session information to stdout
+        :param verify: If set to True, the certificate passed by NSX Manager is strictly verified
+        :param suppress_warnings: If set to True, InsecureRequestWarnings caused by self signed certs are disabled
+        :param pool_maxsize: The maximum number of connections to NSX Manager kept open for reuse. Set it to the
+               number of threads sharing the session, so that no thread has to open a new connection
+        :param pool_block: If set to True, a request waits for a free connection when pool_maxsize connections are
+               in use, instead of opening an additional connection that is discarded after the request
+        :param keep_alive: If set to False, every connection is closed after its request
+        :param auth_token: If set to True, requests are authenticated with an NSX API auth token that is obtained
+               once with username and password and refreshed before it expires, instead of with basic credentials
+        :param token_cache_dir: The directory in which auth tokens are shared with other processes using the same
+               NSX Manager and credentials. Set to False to keep the token in memory only
+        :param retry_policy: The RetryPolicy deciding which failed requests are sent again, a RetryPolicy with
+               default settings if not set
+        :param rate_limiter: A throttle.RateLimiter limiting the requests per second sent by the session
+        :param concurrency_limiter: A throttle.AdaptiveConcurrencyLimiter limiting the requests in flight
+        :param timeout: The connect and read timeout of requests in seconds, as a number or a (connect timeout,
+               read timeout) tuple
+        :param compression: If set to True, request bodies of at least compress_threshold bytes are sent gzip
+               compressed, and the Accept-Encoding header is narrowed to gzip. Responses are requested compressed
+               either way, as requests sends Accept-Encoding: gzip, deflate by default
+        :param compress_threshold: The size in bytes from which request bodies are compressed
+        :param coalesce_reads: If set to True, identical GET requests sent while the first of them is in flight
+               wait for its response instead of being sent to NSX Manager again
+        :param response_cache: A responsecache.ResponseCache keeping the responses of GET requests, which are
+               revalidated with their ETag instead of being downloaded again while unchanged
+        :param circuit_breaker: A throttle.CircuitBreaker rejecting requests with errors.NsxCircuitOpenError while
+               NSX Manager is failing, instead of sending and retrying them
+        :return: Returns a Session Object
+        """
         self._username = username
         self._password = password
         self._debug = debug
         self._verify = verify
         self._suppress_warnings = suppress_warnings
+        self._retry_policy = retry_policy or retrypolicy.RetryPolicy()
+        self._rate_limiter = rate_limiter
+        self._timeout = timeout
+        self._compression = compression
+        self._single_flight = SingleFlight() if coalesce_reads else None
+        self._response_cache = response_cache
+        self._compress_threshold = compress_threshold
+        self._transfer_stats = {'request_bytes_sent': 0, 'request_bytes_saved': 0, 'response_bytes_received': 0,
+                                'response_bytes_saved': 0}
+        self._transfer_stats_lock = threading.Lock()
+        self._concurrency_limiter = concurrency_limiter
+        self._circuit_breaker = circuit_breaker
         self._session = requests.Session()
         self._session.verify = self._verify
-        self._session.auth = (self._username, self._password)
+        if auth_token:
+            self._session.auth = authtoken.TokenAuth(self._session, self._username, self._password,
+                                                     cache_dir=token_cache_dir, timeout=timeout)
+        else:
+            self._session.auth = (self._username, self._password)
+
+        # one connection pool per NSX Manager host, sized for the number of concurrent callers
+        self._http_adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize,
+                                                           pool_block=pool_block)
+        self._session.mount('https://', self._http_adapter)
+        self._session.mount('http://', self._http_adapter)
+        if not keep_alive:
+            self._session.headers['Connection'] = 'close'
+        # requests already accepts gzip and deflate compressed responses, compression only narrows it to gzip
+        if compression:
+            self._session.headers['Accept-Encoding'] = 'gzip'
 
         # if debug then enable underlying httplib debugging
         if self._debug:
@@ -70,42 +200,90 @@ class Session(object):
         if self._suppress_warnings:
             requests.packages.urllib3.disable_warnings()
 
-    @retry(OpenSSL.SSL.SysCallError)
-    def do_request(self, method, url, data=None, headers=None, params=None):
+    def connection_stats(self):
+        """
+        Report how well the connections to NSX Manager are reused, e.g. to size pool_maxsize
+        :return: A dictionary with an entry per host, holding the number of requests sent, the number of
+                 connections opened and the number of requests that reused an open connection
+        """
+        connection_stats = {}
+        for pool_key in self._http_adapter.poolmanager.pools.keys():
+            connection_pool = self._http_adapter.poolmanager.pools.get(pool_key)
+            if connection_pool is None:
+                continue
+            connection_stats[connection_pool.host] = {'requests': connection_pool.num_requests,
+                                                      'connections': connection_pool.num_connections,
+                                                      'reused': max(connection_pool.num_requests -
+                                                                    connection_pool.num_connections, 0)}
+        return connection_stats
+
+    def do_request(self, method, url, data=None, headers=None, params=None, resource_name=None, timeout=None,
+                   deadline=None):
         """
         Handle API requests / responses transport
 
         :param method: HTTP method to use as string
         :param data: Any data as PyDict (will be converted to XML string)
         :param headers: Any data as PyDict
+        :param resource_name: The displayName of the RAML resource, used to identify the request in errors
+        :param timeout: The connect and read timeout of this request, overriding the timeout of the session
+        :param deadline: The time, as returned by time.time(), by which the request including all retries must
+               have completed
         :return: If response is XML then an xml.etree.ElementTree else the raw content
-        :raise: Any unsuccessful HTTP response code
+        :raise: errors.NsxHttpError on any unsuccessful HTTP response code, errors.NsxConnectionError if NSX Manager
+                could not be reached, errors.NsxTimeoutError if NSX Manager did not respond in time
         """
+        if self._single_flight and method.upper() == 'GET' and not data:
+            request_key = self._get_request_key(url, headers, params)
+            return self._single_flight.do(request_key, self._do_request, (method, url, data, headers, params,
+                                                                          resource_name, timeout, deadline),
+                                          deadline, resource_name)
+        return self._do_request(method, url, data, headers, params, resource_name, timeout, deadline)
 
+    @staticmethod
+    def _get_request_key(url, headers, params):
+        return url, tuple(sorted((params or {}).items())), tuple(sorted((headers or {}).items()))
+
+    def _do_request(self, method, url, data, headers, params, resource_name, timeout, deadline):
         response_content = None
+        cache_key = cached = None
+        if self._response_cache and method.upper() == 'GET' and not data:
+            cache_key = self._get_request_key(url, headers, params)
+            cached = self._response_cache.get(cache_key)
+            if cached:
+                headers = dict(headers or {}, **{'If-None-Match': cached[0]})
+
         if data:
-            if headers:
-                headers.update({'Content-Type': 'application/xml'})
-            else:
-                headers = {'Content-Type': 'application/xml'}
+            # the headers are copied, as callers reuse their headers dictionary for bodies that are not compressed,
+            # and execute_many shares it between threads
+            headers = dict(headers or {})
+            headers['Content-Type'] = 'application/xml'
 
             if self._debug:
                 print md.parseString(data).toprettyxml()
 
-        response = self._session.request(method, url, headers=headers, params=params, data=data)
+            if self._compression and len(data) >= self._compress_threshold:
+                data = self._compress_body(data, headers)
 
-        if response.status_code not in [200, 201, 204]:
-            if 'content-type' in response.headers:
-                if response.headers['content-type'].find('text/html') != -1:
-                    response_content = self._html2text(response.content)
-                elif response.headers['content-type'].find('application/xml') != -1:
-                    response_content = xmloperations.pretty_xml(response.content)
-                else:
-                    response_content = response.content
-            else:
-                response_content = response.content
+        try:
+            response = self._send_request(method, url, resource_name, timeout or self._timeout, deadline,
+                                          headers=headers, params=params, data=data)
+        except requests.exceptions.Timeout as e:
+            raise errors.NsxTimeoutError(e, method, url, resource_name)
+        except (requests.exceptions.RequestException, self._retry_policy.retry_exceptions) as e:
+            raise errors.NsxConnectionError(e, method, url, resource_name)
+        finally:
+            # a write may have changed the object even if its response is an error or never arrived
+            if self._response_cache and method.upper() not in ['GET', 'HEAD', 'OPTIONS']:
+                self._response_cache.invalidate(url)
 
-            sys.exit('receive bad status code {}\n{}'.format(response.status_code, response_content))
+        self._count_response_bytes(response)
+
+        if cached and response.status_code == 304:
+            return self._response_cache.hit(cached[1])
+
+        if response.status_code not in [200, 201, 204]:
+            raise self._get_http_error(response, method, url, resource_name)
 
         elif 'content-type' in response.headers:
             if response.headers['content-type'].find('application/xml') != -1:
@@ -122,52 +300,330 @@ class Session(object):
 
         if 'Etag' in response.headers:
             response_odict['Etag'] = response.headers['Etag']
+            if cache_key and response.status_code == 200:
+                self._response_cache.put(cache_key, url, response_odict['Etag'], response_odict, resource_name)
 
         return response_odict
-# Thanks to Joseph Roten for the great sample code used in _html2text
-# http://stackoverflow.com/questions/14694482/converting-html-to-text-with-python
-    def _html2text(self, strText):
-        str1 = strText
-        int2 = str1.lower().find("<body")
-        if int2 > 0:
-           str1 = str1[int2:]
-        int2 = str1.lower().find("</body>")
-        if int2 > 0:
-           str1 = str1[:int2]
-        list1 = ['<br>',  '<tr',  '<td', '</p>', 'span>', 'li>', '</h', 'div>' ]
-        list2 = [chr(13), chr(13), chr(9), chr(13), chr(13),  chr(13), chr(13), chr(13)]
-        bolFlag1 = True
-        bolFlag2 = True
-        strReturn = ""
-        for int1 in range(len(str1)):
-          str2 = str1[int1]
-          for int2 in range(len(list1)):
-            if str1[int1:int1+len(list1[int2])].lower() == list1[int2]:
-               strReturn = strReturn + list2[int2]
-          if str1[int1:int1+7].lower() == '<script' or str1[int1:int1+9].lower() == '<noscript':
-             bolFlag1 = False
-          if str1[int1:int1+6].lower() == '<style':
-             bolFlag1 = False
-          if str1[int1:int1+7].lower() == '</style':
-             bolFlag1 = True
-          if str1[int1:int1+9].lower() == '</script>' or str1[int1:int1+11].lower() == '</noscript>':
-             bolFlag1 = True
-          if str2 == '<':
-             bolFlag2 = False
-          if bolFlag1 and bolFlag2 and (ord(str2) != 10) :
-            strReturn = strReturn + str2
-          if str2 == '>':
-             bolFlag2 = True
-          if bolFlag1 and bolFlag2:
-            strReturn = strReturn.replace(chr(32)+chr(13), chr(13))
-            strReturn = strReturn.replace(chr(9)+chr(13), chr(13))
-            strReturn = strReturn.replace(chr(13)+chr(32), chr(13))
-            strReturn = strReturn.replace(chr(13)+chr(9), chr(13))
-            strReturn = strReturn.replace(chr(13)+chr(13), chr(13))
-        strReturn = strReturn.replace(chr(13), '\n')
-        return strReturn
 
+    def do_stream_request(self, method, url, tags, headers=None, params=None, resource_name=None, timeout=None,
+                          deadline=None, chunk_size=65536):
+        """
+        Send a request and parse the XML response while it is received, without holding the whole response
+        :param method: HTTP method to use as string
+        :param tags: The tags of the response elements to return, see xmloperations.iter_xml_elements
+        :param headers: Any data as PyDict
+        :param resource_name: The displayName of the RAML resource, used to identify the request in errors
+        :param timeout: The connect and read timeout of this request, overriding the timeout of the session
+        :param deadline: The time, as returned by time.time(), by which the response must have started
+        :param chunk_size: The number of bytes read from the response at once
+        :return: A generator of dictionaries, one for each element with one of the tags, in the format returned by
+                 xmloperations.xml_to_dict. The request is sent when the iteration starts
+        :raise: The same errors as do_request
+        """
+        try:
+            response = self._send_request(method, url, resource_name, timeout or self._timeout, deadline,
+                                          headers=headers, params=params, stream=True)
+        except requests.exceptions.Timeout as e:
+            raise errors.NsxTimeoutError(e, method, url, resource_name)
+        except (requests.exceptions.RequestException, self._retry_policy.retry_exceptions) as e:
+            raise errors.NsxConnectionError(e, method, url, resource_name)
+
+        try:
+            if response.status_code not in [200, 201, 204]:
+                self._count_response_bytes(response)
+                raise self._get_http_error(response, method, url, resource_name)
+
+            response_bytes = [0]
+
+            def response_chunks():
+                for response_chunk in response.iter_content(chunk_size):
+                    response_bytes[0] += len(response_chunk)
+                    yield response_chunk
+
+            try:
+                for parsed_element in xmloperations.iter_xml_elements(response_chunks(), tags):
+                    yield parsed_element
+            except requests.exceptions.Timeout as e:
+                raise errors.NsxTimeoutError(e, method, url, resource_name)
+            except (requests.exceptions.RequestException, self._retry_policy.retry_exceptions) as e:
+                raise errors.NsxConnectionError(e, method, url, resource_name)
+            self._count_response_bytes(response, response_bytes[0])
+        finally:
+            response.close()
+
+    def do_download(self, method, url, sink, headers=None, params=None, resource_name=None, timeout=None,
+                    deadline=None, resume=False, progress_callback=None, chunk_size=1048576):
+        """
+        Send a request and write the response body to a file or file like object while it is received, for large
+        non XML responses like tech support bundles. If the connection fails during the download, the download is
+        continued from the last byte received, as long as the retry policy allows another try and NSX Manager
+        reported an ETag or Last-Modified header to make sure that the rest belongs to the same body
+        :param method: HTTP method to use as string
+        :param sink: The path of the file to write to, or a file like object with a write method
+        :param headers: Any data as PyDict
+        :param resource_name: The displayName of the RAML resource, used to identify the request in errors
+        :param timeout: The connect and read timeout of the requests, overriding the timeout of the session
+        :param deadline: The time, as returned by time.time(), by which the download must have completed
+        :param resume: If set to True and sink is the path of a file left by an interrupted download, the download
+               continues at the end of the file if the body did not change since. The ETag or Last-Modified header
+               of the body is kept next to the file, in the file name with the suffix .resume, until the download
+               completed. Without it the file is downloaded again
+        :param progress_callback: A function called after every chunk with the number of bytes downloaded and the
+               total number of bytes, or None if NSX Manager did not report the size
+        :param chunk_size: The number of bytes read from the response at once
+        :return: The number of bytes of the downloaded body
+        :raise: The same errors as do_request
+        """
+        if not isinstance(sink, basestring):
+            return self._download(method, url, sink, 0, None, headers, params, resource_name, timeout, deadline,
+                                  progress_callback, chunk_size)
+
+        validator_file = sink + '.resume' if resume else None
+        validator = self._read_validator(validator_file) if resume and os.path.isfile(sink) else None
+        offset = os.path.getsize(sink) if validator else 0
+        with open(sink, 'ab' if offset else 'wb') as sink_file:
+            downloaded_bytes = self._download(method, url, sink_file, offset, validator, headers, params,
+                                              resource_name, timeout, deadline, progress_callback, chunk_size,
+                                              validator_file)
+        if validator_file and os.path.isfile(validator_file):
+            os.remove(validator_file)
+        return downloaded_bytes
+
+    def _download(self, method, url, sink, offset, validator, headers, params, resource_name, timeout, deadline,
+                  progress_callback, chunk_size, validator_file=None):
+        # offsets are counted in bytes of the body as sent, so NSX Manager must not compress it. A download is only
+        # continued with If-Range, so that NSX Manager sends the whole body again if it changed, e.g. as tech
+        # support bundles are created anew for every request
+        request_headers = dict(headers or {})
+        request_headers['Accept-Encoding'] = 'identity'
+        attempt = 0
+        while True:
+            request_headers.pop('Range', None)
+            request_headers.pop('If-Range', None)
+            if offset and validator:
+                request_headers['Range'] = 'bytes={}-'.format(offset)
+                request_headers['If-Range'] = validator
+            elif offset:
+                self._truncate_sink(sink, method, url, resource_name)
+                offset = 0
+            try:
+                response = self._send_request(method, url, resource_name, timeout or self._timeout, deadline,
+                                              headers=request_headers, params=params, stream=True)
+            except requests.exceptions.Timeout as e:
+                raise errors.NsxTimeoutError(e, method, url, resource_name)
+            except (requests.exceptions.RequestException, self._retry_policy.retry_exceptions) as e:
+                raise errors.NsxConnectionError(e, method, url, resource_name)
+
+            try:
+                if response.status_code == 416 and offset:
+                    # the range starts at the end of the unchanged body, the download is already complete
+                    return offset
+                if response.status_code not in [200, 206]:
+                    self._count_response_bytes(response)
+                    raise self._get_http_error(response, method, url, resource_name)
+                if response.status_code == 200:
+                    if offset:
+                        # the body changed or NSX Manager ignored the range, and sends the whole body
+                        self._truncate_sink(sink, method, url, resource_name)
+                        offset = 0
+                    validator = self._get_validator(response)
+                    if validator_file:
+                        self._write_validator(validator_file, validator)
+
+                total_bytes = self._get_download_size(response)
+                response_bytes = 0
+                try:
+                    for response_chunk in response.iter_content(chunk_size):
+                        sink.write(response_chunk)
+                        offset += len(response_chunk)
+                        response_bytes += len(response_chunk)
+                        if progress_callback:
+                            progress_callback(offset, total_bytes)
+                    if total_bytes is not None and offset < total_bytes:
+                        raise requests.exceptions.ConnectionError('connection closed after {} of {} '
+                                                                  'bytes'.format(offset, total_bytes))
+                    return offset
+                except (requests.exceptions.RequestException, self._retry_policy.retry_exceptions) as e:
+                    backoff = self._retry_policy.get_backoff(attempt, method, exception=e)
+                    if not self._retry_allowed(backoff, deadline):
+                        if isinstance(e, requests.exceptions.Timeout):
+                            raise errors.NsxTimeoutError(e, method, url, resource_name)
+                        raise errors.NsxConnectionError(e, method, url, resource_name)
+                    if self._debug:
+                        print 'Error {} occured, resume download in {:.1f} seconds'.format(str(e), backoff)
+                finally:
+                    self._count_response_bytes(response, response_bytes)
+            finally:
+                response.close()
+            time.sleep(backoff)
+            attempt += 1
+
+    @staticmethod
+    def _get_validator(response):
+        # If-Range only accepts a strong ETag, or else the Last-Modified date
+        etag = response.headers.get('etag')
+        if etag and not etag.startswith('W/'):
+            return etag
+        return response.headers.get('last-modified')
+
+    @staticmethod
+    def _read_validator(validator_file):
+        try:
+            with open(validator_file) as validator_fh:
+                return validator_fh.read().strip() or None
+        except IOError:
+            return None
+
+    @staticmethod
+    def _write_validator(validator_file, validator):
+        if not validator:
+            if os.path.isfile(validator_file):
+                os.remove(validator_file)
+            return
+        with open(validator_file, 'w') as validator_fh:
+            validator_fh.write(validator)
+
+    @staticmethod
+    def _get_download_size(response):
+        # a partial response reports the total size in Content-Range, a full response in Content-Length
+        if response.status_code == 206:
+            content_range = _content_range_total.search(response.headers.get('content-range', ''))
+            if content_range:
+                return int(content_range.group(1))
+        elif 'content-length' in response.headers:
+            return int(response.headers['content-length'])
+        return None
+
+    @staticmethod
+    def _truncate_sink(sink, method, url, resource_name):
+        try:
+            sink.seek(0)
+            sink.truncate()
+        except (AttributeError, IOError) as e:
+            raise errors.NsxConnectionError('download can not be resumed: {}'.format(e), method, url,
+                                            resource_name)
+
+    def transfer_stats(self):
+        """
+        Report the bytes transferred and the bytes saved by compression
+        :return: A dictionary with the request body bytes sent and saved by compressing them, and the response body
+                 bytes received and saved by NSX Manager compressing them
+        """
+        with self._transfer_stats_lock:
+            return dict(self._transfer_stats)
+
+    def circuit_breaker_stats(self):
+        """
+        Report the state of the circuit breaker
+        :return: The dictionary returned by throttle.CircuitBreaker.stats, or None if the session has no breaker
+        """
+        if self._circuit_breaker:
+            return self._circuit_breaker.stats()
+
+    def _compress_body(self, data, headers):
+        # gzip the request body, NSX Manager tells the body apart by the Content-Encoding header
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        compressed_data = compressor.compress(data) + compressor.flush()
+        headers['Content-Encoding'] = 'gzip'
+        with self._transfer_stats_lock:
+            self._transfer_stats['request_bytes_saved'] += len(data) - len(compressed_data)
+        return compressed_data
+
+    def _count_response_bytes(self, response, response_bytes=None):
+        # the raw response counts the bytes read from the connection, before they are decompressed
+        request_body = response.request.body or ''
+        if response_bytes is None:
+            response_bytes = len(response.content)
+        # urllib3 does not count the bytes of chunked responses
+        try:
+            wire_bytes = response.raw.tell() or response_bytes
+        except (AttributeError, IOError):
+            wire_bytes = response_bytes
+        with self._transfer_stats_lock:
+            self._transfer_stats['request_bytes_sent'] += len(request_body)
+            self._transfer_stats['response_bytes_received'] += wire_bytes
+            if response.headers.get('content-encoding'):
+                self._transfer_stats['response_bytes_saved'] += max(response_bytes - wire_bytes, 0)
+
+    @staticmethod
+    def _get_http_error(response, method, url, resource_name):
+        # the error renders the response body when it is shown, not when it is raised
+        return errors.http_error_class(response.status_code)(response.status_code, response.content,
+                                                             response.headers, method, url, resource_name)
+
+    def _send_request(self, method, url, resource_name, timeout, deadline, **kwargs):
+        # sends the request, and sends it again as long as the retry policy considers the failure transient and
+        # the deadline leaves time for another try
+        self._retry_policy.request_sent()
+        attempt = 0
+        while True:
+            if deadline and time.time() >= deadline:
+                raise errors.NsxTimeoutError('deadline passed', method, url, resource_name)
+            try:
+                response = self._send_throttled_request(method, url, resource_name, deadline,
+                                                        timeout=self._get_request_timeout(timeout, deadline), **kwargs)
+            except self._retry_policy.retry_exceptions as e:
+                backoff = self._retry_policy.get_backoff(attempt, method, exception=e)
+                if not self._retry_allowed(backoff, deadline):
+                    raise
+                failure = str(e)
+            else:
+                backoff = self._retry_policy.get_backoff(attempt, method, response=response)
+                if not self._retry_allowed(backoff, deadline):
+                    return response
+                failure = 'status code {}'.format(response.status_code)
+                response.close()
+            if self._debug:
+                print 'Error {} occured, retry in {:.1f} seconds'.format(failure, backoff)
+            time.sleep(backoff)
+            attempt += 1
+
+    def _retry_allowed(self, backoff, deadline):
+        # a failed request is not sent again if the retry policy declines it, if the deadline would pass during the
+        # backoff or if the failure opened the circuit breaker
+        if backoff is None or (deadline and time.time() + backoff >= deadline):
+            return False
+        return not self._circuit_breaker or self._circuit_breaker.state != throttle.CircuitBreaker.OPEN
 
+    @staticmethod
+    def _get_request_timeout(timeout, deadline):
+        # shortens the timeout to the time left until the deadline
+        if not deadline:
+            return timeout
+        remaining = max(deadline - time.time(), 0.001)
+        if isinstance(timeout, tuple):
+            return tuple(min(part, remaining) if part else remaining for part in timeout)
+        return min(timeout, remaining) if timeout else remaining
 
+    def _send_throttled_request(self, method, url, resource_name, deadline, **kwargs):
+        # rejects the request while the circuit breaker is open, waits for the rate and concurrency limiters before
+        # sending, at most until the deadline, and reports the outcome to the circuit breaker and the concurrency
+        # limiter. Retries pass the breaker and the limiters again, so that retries cannot flood an overloaded NSX
+        # Manager
+        if self._circuit_breaker and not self._circuit_breaker.acquire():
+            raise errors.NsxCircuitOpenError(self._circuit_breaker.retry_at, method, url, resource_name)
+        if not self._acquire_limiters(resource_name, deadline):
+            if self._circuit_breaker:
+                self._circuit_breaker.cancel()
+            raise errors.NsxTimeoutError('deadline passed while waiting for the rate or concurrency limit', method,
+                                         url, resource_name)
+        if not self._concurrency_limiter and not self._circuit_breaker:
+            return self._session.request(method, url, **kwargs)
 
+        request_start = time.time()
+        overloaded = True
+        try:
+            response = self._session.request(method, url, **kwargs)
+            overloaded = response.status_code >= 500 or response.status_code == 429
+            return response
+        finally:
+            latency = time.time() - request_start
+            if self._concurrency_limiter:
+                self._concurrency_limiter.release(latency, overloaded)
+            if self._circuit_breaker:
+                self._circuit_breaker.release(latency, overloaded)
 
+    def _acquire_limiters(self, resource_name, deadline):
+        if self._rate_limiter and not self._rate_limiter.acquire(resource_name, deadline):
+            return False
+        return not self._concurrency_limiter or self._concurrency_limiter.acquire(deadline)
@@ -0,0 +1,199 @@
+# coding=utf-8
+#
+# Copyright © 2015 VMware, Inc. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+# to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+
+
+__author__ = 'yfauser'
+
+import os
+import re
+import sys
+import mmap
+import errno
+import struct
+import marshal
+import hashlib
+import tempfile
+
+import nsxramlclient
+
+# increase when the layout of the compiled RAML changes, so that cache files written by older code are ignored
+CACHE_FORMAT_VERSION = 2
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.nsxramlclient', 'cache')
+
+# a cache file starts with the magic string, the format version and the length of the index. The index holds the
+# base URI and the offset and length of every resource and schema entry, followed by the marshalled entries
+_CACHE_MAGIC = 'NSXRAMLC'
+_cache_prefix = struct.Struct('>8sII')
+
+_include_pattern = re.compile(r'!include\s+(\S+)')
+
+
+def cache_file_path(raml_file, cache_dir=None):
+    """
+    Compute the cache file name of a RAML File
+    :param raml_file: The RAML File the cache file is computed for
+    :param cache_dir: The directory holding the cache files, defaults to DEFAULT_CACHE_DIR
+    :return: The path of the cache file. The name is a hash over the content of the RAML File and of all files it
+             includes, the client version and the python version, so a changed RAML File or client never reads a
+             stale cache file
+    """
+    cache_key = '{}:{}:{}.{}:{}'.format(nsxramlclient.__version__, CACHE_FORMAT_VERSION, sys.version_info[0],
+                                        sys.version_info[1], raml_file_digest(raml_file))
+    return os.path.join(cache_dir or DEFAULT_CACHE_DIR, '{}.ramlc'.format(hashlib.sha1(cache_key).hexdigest()))
+
+
+def raml_file_digest(raml_file):
+    """
+    :param raml_file: The RAML File
+    :return: The SHA1 hex digest over the content of the RAML File and of all files it includes
+    """
+    raml_digest = hashlib.sha1()
+    for file_content in _read_raml_files(raml_file, set()):
+        raml_digest.update(file_content)
+    return raml_digest.hexdigest()
+
+
+def _read_raml_files(raml_file, visited_files):
+    # yields the content of the RAML File followed by the content of every file it includes
+    raml_file = os.path.abspath(raml_file)
+    if raml_file in visited_files:
+        return
+    visited_files.add(raml_file)
+    with open(raml_file, 'rb') as raml_file_handle:
+        file_content = raml_file_handle.read()
+    yield file_content
+    for included_file in _include_pattern.findall(file_content):
+        if '://' in included_file:
+            continue
+        included_path = os.path.join(os.path.dirname(raml_file), included_file)
+        if os.path.isfile(included_path):
+            for included_content in _read_raml_files(included_path, visited_files):
+                yield included_content
+
+
+class CacheEntries(object):
+    def __init__(self, cache_buffer, data_offset, entries_index):
+        """
+        A read only mapping of the resource or schema entries of a cache file. Every entry is unmarshalled the first
+        time it is read
+        :param cache_buffer: The content of the cache file, as string or memory map
+        :param data_offset: The offset of the first entry in the cache file
+        :param entries_index: A dictionary of entry names to their (offset, length) relative to data_offset
+        :return: Returns a CacheEntries Object
+        """
+        self._cache_buffer = cache_buffer
+        self._data_offset = data_offset
+        self._entries_index = entries_index
+        self._entries = {}
+
+    def __contains__(self, name):
+        return name in self._entries_index
+
+    def __len__(self):
+        return len(self._entries_index)
+
+    def __getitem__(self, name):
+        try:
+            return self._entries[name]
+        except KeyError:
+            pass
+        offset, length = self._entries_index[name]
+        entry_start = self._data_offset + offset
+        entry = marshal.loads(self._cache_buffer[entry_start:entry_start + length])
+        self._entries[name] = entry
+        return entry
+
+    def get(self, name, default=None):
+        if name in self._entries_index:
+            return self[name]
+        return default
+
+    def keys(self):
+        return self._entries_index.keys()
+
+    def to_dict(self):
+        return {name: self[name] for name in self._entries_index}
+
+
+def load(cache_file, lazy=False):
+    """
+    Load a compiled RAML from the cache
+    :param cache_file: The cache file as returned by cache_file_path
+    :param lazy: Optional: If set to True, the cache file is memory mapped and only its index is read, the resources
+           and schemas are returned as CacheEntries that are read when they are first used. Default: False
+    :return: The compiled RAML, or None if the cache file does not exist or can't be read
+    """
+    try:
+        with open(cache_file, 'rb') as cache_file_handle:
+            if lazy:
+                cache_buffer = mmap.mmap(cache_file_handle.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                cache_buffer = cache_file_handle.read()
+        cache_magic, cache_format_version, index_length = _cache_prefix.unpack(cache_buffer[:_cache_prefix.size])
+        if cache_magic != _CACHE_MAGIC or cache_format_version != CACHE_FORMAT_VERSION:
+            return None
+        data_offset = _cache_prefix.size + index_length
+        base_uri, resources_index, schemas_index = marshal.loads(cache_buffer[_cache_prefix.size:data_offset])
+    except (EnvironmentError, EOFError, ValueError, TypeError, struct.error):
+        return None
+
+    resources = CacheEntries(cache_buffer, data_offset, resources_index)
+    schemas = CacheEntries(cache_buffer, data_offset, schemas_index)
+    if not lazy:
+        resources, schemas = resources.to_dict(), schemas.to_dict()
+    return {'base_uri': base_uri, 'resources': resources, 'schemas': schemas}
+
+
+def store(cache_file, compiled_raml):
+    """
+    Write a compiled RAML to the cache. The file is written under a temporary name and renamed when complete, so
+    concurrent processes never read a partial cache file. Failing to write the cache is not an error, the next
+    session will simply parse the RAML File again
+    :param cache_file: The cache file as returned by cache_file_path
+    :param compiled_raml: The compiled RAML, containing only python builtin types
+    """
+    entries_data = []
+    entries_length = [0]
+
+    def add_entries(entries):
+        entries_index = {}
+        for name, entry in entries.items():
+            entry_data = marshal.dumps(entry, 2)
+            entries_index[name] = (entries_length[0], len(entry_data))
+            entries_data.append(entry_data)
+            entries_length[0] += len(entry_data)
+        return entries_index
+
+    cache_index = marshal.dumps((compiled_raml['base_uri'], add_entries(compiled_raml['resources']),
+                                 add_entries(compiled_raml['schemas'])), 2)
+
+    cache_dir = os.path.dirname(cache_file)
+    try:
+        os.makedirs(cache_dir)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            return
+    try:
+        temp_fd, temp_file = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        with os.fdopen(temp_fd, 'wb') as temp_file_handle:
+            temp_file_handle.write(_cache_prefix.pack(_CACHE_MAGIC, CACHE_FORMAT_VERSION, len(cache_index)))
+            temp_file_handle.write(cache_index)
+            temp_file_handle.writelines(entries_data)
+        os.rename(temp_file, cache_file)
+    except (IOError, OSError):
+        return
@@ -0,0 +1,143 @@
+# coding=utf-8
+#
+# Copyright © 2015 VMware, Inc. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+# to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+
+
+
+__author__ = 'yfauser'
+
+import time
+import urlparse
+import threading
+from collections import OrderedDict
+
+import xmloperations
+
+
+class ResponseCache(object):
+    """
+    Keeps the responses of reads together with their ETag, so that a repeated read is sent with If-None-Match and
+    NSX Manager can answer 304 Not Modified instead of sending and the client parsing the body again. The cache is
+    bounded by the number of entries, evicting the least recently used entry, and by a time to live per resource.
+    A write to a URL drops the cached reads of the same object, of the objects below it and of the objects
+    containing it, e.g. an update of a DFW rule drops the cached DFW configuration
+    """
+    def __init__(self, max_entries=256, default_ttl=300, resource_ttls=None):
+        """
+        :param max_entries: The number of responses kept at most
+        :param default_ttl: The number of seconds a response is kept, None to keep it until it is evicted
+        :param resource_ttls: A dictionary of displayName prefixes and the number of seconds the responses of the
+               resources starting with the prefix are kept. If several prefixes match, the longest one applies
+        """
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._resource_ttls = resource_ttls or {}
+        self._resource_prefixes = sorted(self._resource_ttls, key=len, reverse=True)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def get(self, key):
+        """
+        :param key: The key of the read, see Session
+        :return: A tuple of the ETag and the cached response, or None if no unexpired response is cached. The
+                 response must not be modified, use hit to obtain a copy of it
+        """
+        with self._lock:
+            entry = self._get_entry(key)
+            return (entry[1], entry[2]) if entry else None
+
+    def hit(self, cached_response):
+        """
+        :param cached_response: The cached response of a read NSX Manager answered with 304 Not Modified
+        :return: A copy of the cached response
+        """
+        with self._lock:
+            self._stats['hits'] += 1
+        return copy_response(cached_response)
+
+    def put(self, key, url, etag, response_odict, resource_name=None):
+        """
+        :param key: The key of the read
+        :param url: The URL of the read, used to find the cached responses affected by writes
+        :param etag: The ETag NSX Manager returned with the response
+        :param response_odict: The response as returned by Session.do_request, a copy is cached
+        :param resource_name: The displayName of the resource, used to find its time to live
+        """
+        ttl = self._get_ttl(resource_name)
+        expires = time.time() + ttl if ttl is not None else None
+        entry = (urlparse.urlsplit(url).path.rstrip('/'), etag, copy_response(response_odict), expires)
+        with self._lock:
+            self._stats['misses'] += 1
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, url):
+        """
+        Drop the cached responses of the object at the URL, of the objects below it and of the objects containing it
+        :param url: The URL a write was sent to
+        """
+        written_path = urlparse.urlsplit(url).path.rstrip('/')
+        with self._lock:
+            for key, entry in self._entries.items():
+                cached_path = entry[0]
+                if cached_path == written_path or written_path.startswith(cached_path + '/') or \
+                        cached_path.startswith(written_path + '/'):
+                    del self._entries[key]
+                    self._stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        :return: A dictionary with the number of reads NSX Manager answered with 304 Not Modified (hits), the
+                 number of reads it answered with a full response carrying an ETag (misses), the number of
+                 responses dropped by writes (invalidations) and the number of cached responses (entries)
+        """
+        with self._lock:
+            cache_stats = dict(self._stats)
+            cache_stats['entries'] = len(self._entries)
+            return cache_stats
+
+    def _get_entry(self, key):
+        # returns the unexpired entry and marks it as most recently used
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        if entry[3] is not None and entry[3] <= time.time():
+            return None
+        self._entries[key] = entry
+        return entry
+
+    def _get_ttl(self, resource_name):
+        if resource_name:
+            for prefix in self._resource_prefixes:
+                if resource_name.startswith(prefix):
+                    return self._resource_ttls[prefix]
+        return self.default_ttl
+
+
+def copy_response(response_odict):
+    # callers must not share mutable body dictionaries with the cache or with each other
+    copied_response = OrderedDict(response_odict)
+    if isinstance(copied_response['body'], dict):
+        copied_response['body'] = xmloperations.copy_dict_tree(copied_response['body'])
+    return copied_response
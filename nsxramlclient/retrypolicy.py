@@ -0,0 +1,147 @@
+# coding=utf-8
+#
+# Copyright © 2015 VMware, Inc. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+# to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+
+
+
+__author__ = 'yfauser'
+
+import time
+import random
+import threading
+import email.utils
+
+import requests
+import OpenSSL.SSL
+
+
+class RetryBudget(object):
+    """
+    Limits retries to a share of the requests sent, so that an NSX Manager that fails every request is not hit with
+    tries times the regular load. Every request adds ratio to the budget and every retry takes one from it
+    """
+    def __init__(self, ratio=0.2, min_retries=10):
+        """
+        :param ratio: The number of retries allowed per request sent
+        :param min_retries: The number of retries available before any request was sent, and the size of the budget
+               kept for later failures while all requests succeed
+        """
+        self._ratio = ratio
+        self._max_balance = float(min_retries)
+        self._balance = float(min_retries)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._balance = min(self._balance + self._ratio, self._max_balance)
+
+    def withdraw(self):
+        """
+        :return: True if a retry is available and was taken from the budget, False if the budget is exhausted
+        """
+        with self._lock:
+            if self._balance < 1:
+                return False
+            self._balance -= 1
+            return True
+
+
+class RetryPolicy(object):
+    """
+    Decides whether a failed request is sent again and how long to wait before. Failures are retried with full
+    jitter exponential backoff, or after the time NSX Manager asked for in a Retry-After header. Only idempotent
+    methods are retried after the request could have reached NSX Manager
+    """
+    idempotent_methods = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+    # errors raised before the request was sent, these are retried for every method
+    connect_exceptions = (requests.exceptions.ConnectTimeout,)
+    # errors raised after the request might have reached NSX Manager
+    transfer_exceptions = (requests.exceptions.ConnectionError, requests.exceptions.Timeout, OpenSSL.SSL.SysCallError)
+
+    def __init__(self, tries=4, backoff_base=0.5, backoff_max=30, retry_statuses=(429, 500, 502, 503, 504),
+                 retry_methods=idempotent_methods, budget=None):
+        """
+        :param tries: The number of times a request is sent at most, 1 disables retries
+        :param backoff_base: The backoff of the first retry in seconds, it doubles with every further retry
+        :param backoff_max: The longest time in seconds waited before a retry, also caps Retry-After
+        :param retry_statuses: The HTTP status codes that are retried. A 429 response is retried for every method,
+               as NSX Manager did not process the request
+        :param retry_methods: The HTTP methods that are retried after responses or errors that can occur after NSX
+               Manager processed the request
+        :param budget: The RetryBudget shared by all requests using this policy, a new RetryBudget by default.
+               Set to False to retry without a budget
+        """
+        self.tries = tries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_statuses = frozenset(retry_statuses)
+        self.retry_methods = frozenset(method.upper() for method in retry_methods)
+        self._budget = RetryBudget() if budget is None else budget
+
+    @property
+    def retry_exceptions(self):
+        return self.connect_exceptions + self.transfer_exceptions
+
+    def is_retryable_method(self, method):
+        return method.upper() in self.retry_methods
+
+    def request_sent(self):
+        """
+        Called once for every request before the first try, this funds the retry budget
+        """
+        if self._budget:
+            self._budget.deposit()
+
+    def get_backoff(self, attempt, method, response=None, exception=None):
+        """
+        :param attempt: The number of the failed try, starting with 0
+        :param method: The HTTP method of the request
+        :param response: The response of the failed try, if NSX Manager responded
+        :param exception: The exception raised by the failed try, if NSX Manager did not respond
+        :return: The number of seconds to wait before sending the request again, or None if the request must not be
+                 sent again
+        """
+        if attempt + 1 >= self.tries:
+            return None
+        if exception is not None:
+            if not isinstance(exception, self.connect_exceptions) and not self.is_retryable_method(method):
+                return None
+        elif response.status_code not in self.retry_statuses:
+            return None
+        elif response.status_code != 429 and not self.is_retryable_method(method):
+            return None
+        if self._budget and not self._budget.withdraw():
+            return None
+
+        retry_after = self._get_retry_after(response) if response is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    @staticmethod
+    def _get_retry_after(response):
+        # Retry-After holds either a number of seconds or a HTTP date
+        retry_after = response.headers.get('Retry-After')
+        if not retry_after:
+            return None
+        try:
+            return max(float(retry_after), 0)
+        except ValueError:
+            retry_date = email.utils.parsedate_tz(retry_after)
+            if retry_date is None:
+                return None
+            return max(email.utils.mktime_tz(retry_date) - time.time(), 0)
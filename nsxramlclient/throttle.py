@@ -0,0 +1,303 @@
+# coding=utf-8
+#
+# Copyright © 2015 VMware, Inc. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+# to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+# TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+# CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+
+
+
+__author__ = 'yfauser'
+
+import time
+import threading
+
+
+class TokenBucket(object):
+    """
+    Allows rate requests per second on average, and bursts of up to burst requests after a quiet period
+    """
+    def __init__(self, rate, burst=None):
+        """
+        :param rate: The number of requests allowed per second
+        :param burst: The number of requests that can be sent at once after a quiet period, defaults to rate but
+               at least 1
+        """
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate, 1))
+        self._tokens = self.burst
+        self._last_refill = time.time()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline=None):
+        """
+        Take a token from the bucket, waiting until one is available
+        :param deadline: The time, as returned by time.time(), after which no longer to wait
+        :return: True if a token was taken, False if none is available before the deadline
+        """
+        while True:
+            with self._lock:
+                now = time.time()
+                self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class RateLimiter(object):
+    """
+    Limits the requests sent to NSX Manager by a client, overall and per resource class. A resource class is a
+    displayName prefix, e.g. 'dfw' limits all DFW resources and 'secGroup' all security group resources together
+    """
+    def __init__(self, rate=None, burst=None, resource_rates=None):
+        """
+        :param rate: The number of requests per second allowed over all resources, None for no overall limit
+        :param burst: The number of requests that can be sent at once after a quiet period, defaults to rate
+        :param resource_rates: A dictionary of displayName prefixes and the number of requests per second allowed
+               for the resources starting with the prefix. If several prefixes match, the longest one applies
+        """
+        self._bucket = TokenBucket(rate, burst) if rate else None
+        self._resource_buckets = dict((prefix, TokenBucket(resource_rate))
+                                      for prefix, resource_rate in (resource_rates or {}).items())
+        self._resource_prefixes = sorted(self._resource_buckets, key=len, reverse=True)
+
+    def acquire(self, resource_name=None, deadline=None):
+        """
+        Wait until a request to the resource is allowed
+        :param resource_name: The displayName of the resource of the request, if known
+        :param deadline: The time, as returned by time.time(), after which no longer to wait
+        :return: True if the request is allowed, False if it is not allowed before the deadline
+        """
+        if resource_name:
+            for prefix in self._resource_prefixes:
+                if resource_name.startswith(prefix):
+                    if not self._resource_buckets[prefix].acquire(deadline):
+                        return False
+                    break
+        return not self._bucket or self._bucket.acquire(deadline)
+
+
+class AdaptiveConcurrencyLimiter(object):
+    """
+    Limits the number of requests in flight to NSX Manager with additive increase / multiplicative decrease. Each
+    successful response faster than the latency target raises the limit by about one per round of requests, each
+    5xx or 429 response, connection failure or response slower than the latency target cuts the limit by factor
+    decrease. The limit is cut at most once per latency target, as the responses of one overloaded round arrive
+    together
+    """
+    def __init__(self, initial_limit=4, min_limit=1, max_limit=32, latency_target=2.0, decrease=0.5):
+        """
+        :param initial_limit: The number of concurrent requests allowed at the start
+        :param min_limit: The limit is never cut below this number of concurrent requests
+        :param max_limit: The limit is never raised above this number of concurrent requests
+        :param latency_target: Responses slower than this number of seconds count as a sign of overload
+        :param decrease: The factor the limit is multiplied with on overload
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.decrease = decrease
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._last_decrease = 0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def acquire(self, deadline=None):
+        """
+        Wait until a request is allowed, every successful acquire must be followed by a release
+        :param deadline: The time, as returned by time.time(), after which no longer to wait
+        :return: True if the request is allowed, False if it is not allowed before the deadline
+        """
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                if not deadline:
+                    self._condition.wait()
+                    continue
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            self._in_flight += 1
+            return True
+
+    def release(self, latency, overloaded=False):
+        """
+        :param latency: The number of seconds the request took
+        :param overloaded: True if NSX Manager responded with 5xx or 429, or could not be reached
+        """
+        with self._condition:
+            self._in_flight -= 1
+            now = time.time()
+            if overloaded or latency > self.latency_target:
+                if now - self._last_decrease > self.latency_target:
+                    self._limit = max(float(self.min_limit), self._limit * self.decrease)
+                    self._last_decrease = now
+            else:
+                self._limit = min(float(self.max_limit), self._limit + 1 / self._limit)
+            self._condition.notify_all()
+
+
+class CircuitBreaker(object):
+    """
+    Stops sending requests to an NSX Manager that is down, so that callers fail at once instead of each waiting
+    for its timeouts and retries. The breaker opens after failure_threshold consecutive failures, i.e. connection
+    failures, 5xx or 429 responses or responses slower than the latency budget. While it is open, requests are
+    rejected. After reset_timeout seconds it is half open and lets half_open_probes requests through: if they all
+    succeed, the breaker closes, if one of them fails, it opens again
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, half_open_probes=1, latency_budget=None,
+                 state_listener=None):
+        """
+        :param failure_threshold: The number of consecutive failures that open the breaker
+        :param reset_timeout: The number of seconds the breaker stays open before probe requests are sent
+        :param half_open_probes: The number of probe requests sent while the breaker is half open
+        :param latency_budget: Responses slower than this number of seconds count as failures, None to only count
+               connection failures, 5xx and 429 responses
+        :param state_listener: A function called with the old and the new state when the state changes, e.g. to
+               pause a scheduler while NSX Manager is down
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.latency_budget = latency_budget
+        self.state_listener = state_listener
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._probes_sent = 0
+        self._probes_succeeded = 0
+        self._stats = {'opened': 0, 'rejected': 0}
+        self._state_changes = []
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            state = self._get_state()
+        self._notify_state_changes()
+        return state
+
+    @property
+    def retry_at(self):
+        """
+        :return: The time, as returned by time.time(), at which the open breaker lets probe requests through, or
+                 None if it is not open
+        """
+        return self.stats()['retry_at']
+
+    def acquire(self):
+        """
+        :return: True if a request may be sent, every allowed request must be followed by a release or a cancel,
+                 False if the request must be rejected
+        """
+        with self._lock:
+            state = self._get_state()
+            allowed = state == self.CLOSED or (state == self.HALF_OPEN and self._probes_sent < self.half_open_probes)
+            if state == self.HALF_OPEN and allowed:
+                self._probes_sent += 1
+            elif not allowed:
+                self._stats['rejected'] += 1
+        self._notify_state_changes()
+        return allowed
+
+    def release(self, latency, overloaded=False):
+        """
+        :param latency: The number of seconds the request took
+        :param overloaded: True if NSX Manager responded with 5xx or 429, or could not be reached
+        """
+        failed = overloaded or (self.latency_budget is not None and latency > self.latency_budget)
+        with self._lock:
+            state = self._get_state()
+            if state == self.HALF_OPEN:
+                if failed:
+                    self._open()
+                else:
+                    self._probes_succeeded += 1
+                    if self._probes_succeeded >= self.half_open_probes:
+                        self._consecutive_failures = 0
+                        self._set_state(self.CLOSED)
+            elif failed:
+                self._consecutive_failures += 1
+                if state == self.CLOSED and self._consecutive_failures >= self.failure_threshold:
+                    self._open()
+            elif state == self.CLOSED:
+                self._consecutive_failures = 0
+        self._notify_state_changes()
+
+    def cancel(self):
+        """
+        Give back an allowed request that was not sent, so that it does not take the place of a probe request
+        """
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._probes_sent > self._probes_succeeded:
+                self._probes_sent -= 1
+
+    def stats(self):
+        """
+        :return: A dictionary with the state, the number of consecutive failures, the number of times the breaker
+                 opened, the number of rejected requests and the time at which an open breaker lets probe requests
+                 through
+        """
+        with self._lock:
+            state = self._get_state()
+            breaker_stats = {'state': state, 'consecutive_failures': self._consecutive_failures,
+                             'opened': self._stats['opened'], 'rejected': self._stats['rejected'],
+                             'retry_at': self._opened_at + self.reset_timeout if state == self.OPEN else None}
+        self._notify_state_changes()
+        return breaker_stats
+
+    def _get_state(self):
+        # an open breaker becomes half open when the reset timeout passed
+        if self._state == self.OPEN and time.time() >= self._opened_at + self.reset_timeout:
+            self._probes_sent = 0
+            self._probes_succeeded = 0
+            self._set_state(self.HALF_OPEN)
+        return self._state
+
+    def _open(self):
+        self._opened_at = time.time()
+        self._stats['opened'] += 1
+        self._set_state(self.OPEN)
+
+    def _set_state(self, state):
+        # state changes are recorded under the lock and reported to the listener after the lock is released, so
+        # that the listener can use the breaker
+        if self.state_listener:
+            self._state_changes.append((self._state, state))
+        self._state = state
+
+    def _notify_state_changes(self):
+        if not self._state_changes:
+            return
+        with self._lock:
+            state_changes, self._state_changes = self._state_changes, []
+        for old_state, new_state in state_changes:
+            self.state_listener(old_state, new_state)
@@ -22,12 +22,61 @@ __author__ = 'yfauser'
 import xml.dom.minidom as md
 from collections import defaultdict
 from lxml import etree as et
+import lxml.html
+
+# elements ending a line, and elements separated by a tab, when converting HTML to text
+_html_line_tags = frozenset(['br', 'p', 'div', 'li', 'tr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'pre', 'title'])
+_html_cell_tags = frozenset(['td', 'th'])
 
 
 def pretty_xml(xml_string):
     return md.parseString(xml_string).toprettyxml()
 
 
+def html_to_text(html_string, max_length=65536):
+    """
+    Convert a HTML page, e.g. an error page of NSX Manager or of a proxy, into readable text. The conversion takes
+    time linear to the size of the page
+    :param html_string: The HTML page
+    :param max_length: Only this number of characters of the page is converted, the rest of an oversized page is
+           dropped
+    :return: The text of the page body without scripts and styles, with a line for each paragraph, line break,
+             list item or table row, as UTF-8 encoded str
+    """
+    if not html_string or not html_string.strip():
+        return ''
+    html_string = html_string[:max_length]
+    if isinstance(html_string, str):
+        # lxml reads pages without a charset declaration as latin-1, error pages are mostly UTF-8
+        try:
+            html_string = html_string.decode('utf-8')
+        except UnicodeDecodeError as e:
+            # the cut at max_length may split the last character
+            if e.start >= len(html_string) - 3:
+                html_string = html_string[:e.start].decode('utf-8')
+    try:
+        html_document = lxml.html.document_fromstring(html_string)
+    except (et.ParserError, ValueError):
+        return html_string.encode('utf-8') if isinstance(html_string, unicode) else html_string
+    et.strip_elements(html_document, 'script', 'style', 'noscript', et.Comment, with_tail=False)
+    html_body = html_document.find('body')
+    if html_body is None:
+        html_body = html_document
+
+    for element in html_body.iter():
+        if element.tag in _html_line_tags:
+            element.tail = '\n' + (element.tail or '')
+        elif element.tag in _html_cell_tags:
+            element.tail = '\t' + (element.tail or '')
+
+    # the text of pages with non ASCII characters like a copyright sign is unicode
+    text_lines = (line.strip() for line in html_body.text_content().splitlines())
+    page_text = '\n'.join(line for line in text_lines if line)
+    if isinstance(page_text, unicode):
+        page_text = page_text.encode('utf-8')
+    return page_text
+
+
 # Thanks to K3---rnc for the great sample code used to convert XML to Dictionary in xml_to_dict
 # http://stackoverflow.com/questions/7684333/converting-xml-to-dictionary-using-elementtree
 def xml_to_dict(etree_object):
@@ -51,6 +100,62 @@ def xml_to_dict(etree_object):
     return return_dict
 
 
+def copy_dict_tree(dict_tree):
+    # a copy of a dictionary created by xml_to_dict, which is much cheaper than copy.deepcopy or a new conversion.
+    # xml_to_dict only creates dicts, lists of dicts or values, strings and None, so only the dicts and lists need
+    # to be copied while the immutable values are shared with the original
+    copied_tree = {}
+    for key, value in dict_tree.iteritems():
+        value_type = type(value)
+        if value_type is dict:
+            copied_tree[key] = copy_dict_tree(value)
+        elif value_type is list:
+            copied_tree[key] = [copy_dict_tree(item) if type(item) is dict else item for item in value]
+        else:
+            copied_tree[key] = value
+    return copied_tree
+
+
+def iter_xml_elements(xml_chunks, tags):
+    """
+    Parse a XML document incrementally and convert the elements with the given tags into dictionaries as soon as
+    they are complete. All other parts of the document are dropped once parsed, so the memory used is bounded by
+    the largest matching element and not by the size of the document
+    :param xml_chunks: An iterable of strings forming the XML document, e.g. the chunks of a HTTP response
+    :param tags: The tags of the elements to return, e.g. ('section',) for the sections of a DFW configuration.
+           Elements nested in a returned element are part of its dictionary
+    :return: A generator of dictionaries in the format returned by xml_to_dict
+    """
+    tags = frozenset([tags] if isinstance(tags, basestring) else tags)
+    parser = et.XMLPullParser(events=('start', 'end'))
+    open_matches = [0]
+
+    def parsed_elements():
+        for event, element in parser.read_events():
+            if event == 'start':
+                if element.tag in tags:
+                    open_matches[0] += 1
+                continue
+            if element.tag in tags:
+                open_matches[0] -= 1
+                yield xml_to_dict(element)
+            # once outside of all matching elements, drop the parsed element and the siblings parsed before it
+            if not open_matches[0]:
+                element.clear()
+                parent = element.getparent()
+                if parent is not None:
+                    while element.getprevious() is not None:
+                        del parent[0]
+
+    for xml_chunk in xml_chunks:
+        parser.feed(xml_chunk)
+        for parsed_element in parsed_elements():
+            yield parsed_element
+    parser.close()
+    for parsed_element in parsed_elements():
+        yield parsed_element
+
+
 def dict_to_xml(dict_to_parse):
     root_dict_key = [k for k in dict_to_parse][0]
     xml_root_object = et.Element(root_dict_key)
@@ -16,7 +16,6 @@
 # CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
 # IN THE SOFTWARE.
 
-# TODO Add code to save the techsupport log to a file
 # TODO Add code to test and save the snapshot log to a file
 
 __author__ = 'yfauser'
@@ -89,8 +88,13 @@ def cluster_config():
 
 
 def controller_techsupport(controller_id):
-    response = s.read('nsxControllerLogs', uri_parameters={'controllerId': controller_id})
-    s.view_response(response)
+    def print_progress(downloaded_bytes, total_bytes):
+        print 'downloaded {} of {} bytes'.format(downloaded_bytes, total_bytes)
+
+    log_file = 'techsupport-{}.log'.format(controller_id)
+    log_size = s.download('nsxControllerLogs', log_file, uri_parameters={'controllerId': controller_id},
+                          progress_callback=print_progress)
+    print 'saved {} bytes of techsupport log to {}'.format(log_size, log_file)
 
 
 def set_controller_syslog(controller_id):
@@ -30,6 +30,12 @@ def readAllconfig():
     all_dfw_config = client_session.read('dfwConfig')
     client_session.view_response(all_dfw_config)
 
+def readAllconfigStream():
+    # Test read all dfw config section by section, without holding the complete config in memory
+
+    for section in client_session.read_stream('dfwConfig', ('section',)):
+        client_session.view_body_dict(section)
+
 def readByFilters():
 
     # Test read only specific parts by supplying filters
@@ -203,6 +209,18 @@ def L3Rules(section_name):
                                             additional_headers={'If-match': etag_value})
     client_session.view_response(delete_response)
 
+def readL3RulesPrepared(section_name):
+
+    l3_dfw_by_name_response = client_session.read('dfwL3Section', query_parameters_dict={'name': section_name})
+    section_id = l3_dfw_by_name_response['body']['section']['@id']
+    rules = client_session.normalize_list_return(l3_dfw_by_name_response['body']['section']['rule'])
+
+    # resolve the RAML details of the rule read once, and reuse it for every rule of the section
+    read_l3_rule = client_session.prepare('dfwL3Rule', 'read')
+    for rule in rules:
+        l3_dfw_rule_read_response = read_l3_rule(uri_parameters={'sectionId': section_id, 'ruleId': rule['@id']})
+        client_session.view_response(l3_dfw_rule_read_response)
+
 def deleteL3Sections(section_name):
     l3_dfw_by_name_response = client_session.read('dfwL3Section', query_parameters_dict={'name': section_name})
     client_session.view_response(l3_dfw_by_name_response)
@@ -362,9 +380,11 @@ def deleteL2Sections(section_name):
 
 
 readAllconfig()
+readAllconfigStream()
 readByFilters()
 readByIds()
 createNewL3Section()
+readL3RulesPrepared('CreatedByRamlClient')
 L3Rules('CreatedByRamlClient')
 updateL3Section('CreatedByRamlClient')
 deleteL3Sections('CreatedByRamlClient')
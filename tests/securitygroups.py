@@ -34,6 +34,18 @@ def get_vm_in_sec_group(session, secgroupid):
     session.view_response(response)
 
 
+def get_vm_in_all_sec_groups(session):
+    all_sec_groups = session.read('secGroupScope', uri_parameters={'scopeId': 'globalroot-0'})['body']
+    sec_group_ids = [sec_group['objectId'] for sec_group in
+                     session.normalize_list_return(all_sec_groups['list']['securitygroup'])]
+    for result in session.map('secGroupVMNodes', 'read', [{'objectId': secgroupid} for secgroupid in sec_group_ids]):
+        if result.ok:
+            session.view_response(result.response)
+        else:
+            print 'reading VMs of {} failed: {}'.format(sec_group_ids[result.index], result.error)
+        print 'took {:.2f} seconds'.format(result.elapsed)
+
+
 def get_ips_in_sec_group(session, secgroupid):
     response = session.read('secGroupIPNodes', uri_parameters={'objectId': secgroupid})
     session.view_response(response)
@@ -134,6 +146,7 @@ def main():
     get_sec_group_by_id(s, new_sec_group)
     get_sec_group_by_vm(s, 'vm-55')
     get_vm_in_sec_group(s, new_sec_group)
+    get_vm_in_all_sec_groups(s)
     get_ips_in_sec_group(s, new_sec_group)
     get_macs_in_sec_group(s, new_sec_group)
     get_vnics_in_sec_group(s, new_sec_group)